@@ -0,0 +1,145 @@
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional, Tuple
+
+# zwracane przez get(), gdy klucza nie ma (None to poprawna, "negatywna" wartość)
+MISSING: Any = object()
+
+
+class CacheStats:
+    """Liczniki jednego cache (do podglądu w /_admin/caches)."""
+
+    __slots__ = ("hits", "stale_hits", "misses", "evictions", "expirations")
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.stale_hits = 0  # stara wartość oddana bez czekania (stale-while-revalidate)
+        self.misses = 0
+        self.evictions = 0  # wypchnięte przez limit rozmiaru
+        self.expirations = 0  # usunięte przy odczycie po TTL
+
+    def as_dict(self) -> Dict[str, Any]:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.stale_hits) / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+def approx_size(obj: Any, _seen: Optional[set] = None) -> int:
+    """
+    Przybliżony rozmiar w bajtach (sys.getsizeof po kontenerach, każdy obiekt raz).
+    Liczone na żądanie - przy dużym cache to kilka-kilkadziesiąt ms.
+    """
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(approx_size(k, _seen) + approx_size(v, _seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(approx_size(v, _seen) for v in obj)
+    return size
+
+
+def key_matches_prefix(key: Hashable, prefix: str) -> bool:
+    # klucze-krotki, np. (id posta, updated) -> "id:updated"
+    if isinstance(key, tuple):
+        key = ":".join(str(k) for k in key)
+    return str(key).startswith(prefix)
+
+
+class TTLCache:
+    """
+    LRU z limitem rozmiaru i TTL per wpis.
+    - ttl=None -> wpisy nie wygasają (tylko LRU)
+    - wartość None traktujemy jako wynik negatywny (np. błąd / brak rekordu)
+      i trzymamy krócej: negative_ttl
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None, negative_ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl if negative_ttl is not None else ttl
+        self._data: "OrderedDict[Hashable, Tuple[Optional[float], Any]]" = OrderedDict()
+        self.counters = CacheStats()
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        hit = self._data.get(key)
+        if hit is None:
+            self.counters.misses += 1
+            return default
+
+        expires_at, val = hit
+        if expires_at is not None and time.monotonic() >= expires_at:
+            del self._data[key]
+            self.counters.expirations += 1
+            self.counters.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.counters.hits += 1
+        return val
+
+    def set(self, key: Hashable, val: Any, ttl: Optional[float] = None) -> Any:
+        if ttl is None:
+            ttl = self.negative_ttl if val is None else self.ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+
+        self._data[key] = (expires_at, val)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.counters.evictions += 1
+        return val
+
+    def peek(self, key: Hashable, default: Any = MISSING) -> Any:
+        # jak get(), ale bez liczników i bez przesuwania w kolejce LRU
+        hit = self._data.get(key)
+        if hit is None:
+            return default
+        expires_at, val = hit
+        if expires_at is not None and time.monotonic() >= expires_at:
+            return default
+        return val
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.peek(key) is not MISSING
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def keys(self) -> Iterator[Hashable]:
+        return iter(list(self._data.keys()))
+
+    def invalidate(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        doomed = [k for k, (_, v) in self._data.items() if predicate(k, v)]
+        for k in doomed:
+            del self._data[k]
+        return len(doomed)
+
+    def invalidate_prefix(self, prefix: str) -> int:
+        return self.invalidate_where(lambda k, _: key_matches_prefix(k, prefix))
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters.as_dict(),
+            "entries": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "approx_bytes": approx_size(self._data),
+        }
@@ -8,6 +8,15 @@ def env(name: str, default: str = "") -> str:
 
 PB_URL = env("PB_URL")
 
+# klient PocketBase: pula połączeń, timeouty (s), ponowienia GET, bezpiecznik
+PB_MAX_CONNECTIONS = int(env("PB_MAX_CONNECTIONS", "50"))
+PB_MAX_KEEPALIVE = int(env("PB_MAX_KEEPALIVE", "20"))
+PB_CONNECT_TIMEOUT = float(env("PB_CONNECT_TIMEOUT", "2"))
+PB_READ_TIMEOUT = float(env("PB_READ_TIMEOUT", "5"))
+PB_GET_RETRIES = int(env("PB_GET_RETRIES", "2"))
+PB_BREAKER_THRESHOLD = int(env("PB_BREAKER_THRESHOLD", "5"))
+PB_BREAKER_RESET = float(env("PB_BREAKER_RESET", "15"))
+
 POSTS_COLLECTION = env("POSTS_COLLECTION")
 COMMENTS_COLLECTION = env("COMMENTS_COLLECTION")
 SERIES_COLLECTION = env("SERIES_COLLECTION")
@@ -15,6 +24,8 @@ SERVICE_COLLECTION = env("SERVICE_COLLECTION")
 
 RECAPTCHA_SITE_KEY = env("RECAPTCHA_SITE_KEY")
 RECAPTCHA_SECRET_KEY = env("RECAPTCHA_SECRET_KEY")
+# google | offline (offline = bez sieci, tylko do testów obciążeniowych / lokalnie)
+RECAPTCHA_VERIFIER = env("RECAPTCHA_VERIFIER", "google")
 
 PB_SERVICE_EMAIL = env("PB_SERVICE_EMAIL")
 PB_SERVICE_PASSWORD = env("PB_SERVICE_PASSWORD")
@@ -25,3 +36,13 @@ SMTP_USER = env("SMTP_USER")
 SMTP_PASS = env("SMTP_PASS")
 CONTACT_TO = env("CONTACT_TO")
 CONTACT_FROM = env("CONTACT_FROM")
+# katalog kolejki maili (musi przeżyć restart kontenera)
+MAIL_SPOOL_DIR = env("MAIL_SPOOL_DIR", "data/mail_spool")
+
+# cooldowny formularzy: sqlite (wspólny dla wszystkich workerów) | memory (jeden proces)
+RATE_LIMIT_BACKEND = env("RATE_LIMIT_BACKEND", "sqlite")
+RATE_LIMIT_DB = env("RATE_LIMIT_DB", "data/ratelimit.sqlite3")
+
+# /_admin/* (tylko z localhost); jeśli ustawiony, wymagany też nagłówek X-Admin-Token.
+# Bez niego działa tylko podgląd - endpointy inwalidacji (POST) zwracają 404.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
@@ -0,0 +1,262 @@
+import asyncio
+import email
+import email.policy
+import json
+import os
+import random
+import smtplib
+import time
+import uuid
+from email.message import EmailMessage
+from typing import Optional
+
+
+class SMTPSender:
+    """
+    Jedno, ponownie używane połączenie SMTP_SSL (logowanie raz, nie przy każdym mailu).
+    Metody są synchroniczne - wołać z wątku (asyncio.to_thread), zawsze z jednego naraz.
+    """
+
+    def __init__(self, host: str, port: int, user: str, password: str, timeout: float = 20, idle_timeout: float = 60):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self._conn: Optional[smtplib.SMTP_SSL] = None
+        self._last_used = 0.0
+
+    def _connect(self) -> smtplib.SMTP_SSL:
+        conn = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        conn.login(self.user, self.password)
+        return conn
+
+    def _alive(self) -> bool:
+        if self._conn is None:
+            return False
+        try:
+            return self._conn.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def send(self, msg: EmailMessage) -> None:
+        # chwilę nieużywane połączenie mogło zostać zamknięte przez serwer
+        if self._conn is not None and (time.monotonic() - self._last_used) > 10 and not self._alive():
+            self.close()
+
+        if self._conn is None:
+            self._conn = self._connect()
+
+        try:
+            self._conn.send_message(msg)
+        except (smtplib.SMTPServerDisconnected, OSError):
+            # jedna próba na świeżym połączeniu; dalsze ponowienia robi kolejka
+            self.close()
+            self._conn = self._connect()
+            self._conn.send_message(msg)
+
+        self._last_used = time.monotonic()
+
+    def close_if_idle(self) -> None:
+        if self._conn is not None and (time.monotonic() - self._last_used) > self.idle_timeout:
+            self.close()
+
+    def close(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        try:
+            conn.quit()
+        except (smtplib.SMTPException, OSError):
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+
+class MailQueue:
+    """
+    Kolejka maili z zapisem na dysk (spool), żeby wiadomości przeżyły restart.
+    - enqueue() zapisuje plik i od razu wraca (formularz nie czeka na SMTP)
+    - worker w tle wysyła po kolei, z ponowieniami i wykładniczym backoffem
+    - po max_attempts plik trafia do spool/failed/
+    Kilka workerów uvicorna może dzielić katalog: plik przejmujemy atomowym rename.
+    """
+
+    def __init__(
+        self,
+        spool_dir: str,
+        sender: SMTPSender,
+        max_attempts: int = 8,
+        base_delay: float = 5,
+        max_delay: float = 60 * 15,
+        poll_interval: float = 5,
+        stale_claim: float = 60 * 10,
+    ):
+        self.spool_dir = spool_dir
+        self.failed_dir = os.path.join(spool_dir, "failed")
+        self.sender = sender
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.stale_claim = stale_claim
+
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    # --- spool ---
+
+    def _path(self, msg_id: str) -> str:
+        return os.path.join(self.spool_dir, f"{msg_id}.json")
+
+    def _write(self, path: str, item: dict) -> None:
+        tmp = f"{path}.tmp-{os.getpid()}"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(item, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def enqueue(self, msg: EmailMessage) -> str:
+        os.makedirs(self.spool_dir, exist_ok=True)
+        msg_id = f"{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}"
+        item = {"id": msg_id, "attempts": 0, "next_try": 0.0, "message": msg.as_string()}
+        self._write(self._path(msg_id), item)
+        self._wakeup.set()
+        return msg_id
+
+    def pending_count(self) -> int:
+        try:
+            return sum(1 for fn in os.listdir(self.spool_dir) if fn.endswith(".json"))
+        except FileNotFoundError:
+            return 0
+
+    def _release_orphans(self) -> None:
+        # pliki przejęte przez proces, który już nie żyje (np. kill w trakcie wysyłki);
+        # w kontenerze PID bywa ten sam po restarcie, więc stare przejęcia zwalniamy też po czasie
+        try:
+            names = os.listdir(self.spool_dir)
+        except FileNotFoundError:
+            return
+
+        for fn in names:
+            if ".sending-" not in fn:
+                continue
+            base, _, pid = fn.rpartition(".sending-")
+            path = os.path.join(self.spool_dir, fn)
+            try:
+                stale = (time.time() - os.path.getmtime(path)) > self.stale_claim
+                if not stale:
+                    os.kill(int(pid), 0)
+                    continue  # proces żyje -> jego sprawa
+            except (ValueError, ProcessLookupError):
+                pass
+            except PermissionError:
+                continue
+            except FileNotFoundError:
+                continue
+            try:
+                os.replace(path, os.path.join(self.spool_dir, base))
+            except FileNotFoundError:
+                pass
+
+    def _claim_due(self) -> tuple:
+        # -> (przejęty wpis albo None, najbliższy next_try spośród niegotowych)
+        next_due = float("inf")
+        try:
+            names = sorted(fn for fn in os.listdir(self.spool_dir) if fn.endswith(".json"))
+        except FileNotFoundError:
+            return None, next_due
+
+        now = time.time()
+        for fn in names:
+            path = os.path.join(self.spool_dir, fn)
+            try:
+                with open(path, encoding="utf-8") as f:
+                    item = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if item.get("next_try", 0) > now:
+                next_due = min(next_due, item["next_try"])
+                continue
+
+            claimed = f"{path}.sending-{os.getpid()}"
+            try:
+                # mtime = moment przejęcia (patrz _release_orphans); przed rename, bo rename
+                # zachowuje stary mtime, a plik po ponowieniach bywa starszy niż stale_claim
+                os.utime(path)
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                continue  # inny worker był szybszy
+            return (item, path, claimed), next_due
+
+        return None, next_due
+
+    # --- worker ---
+
+    def _drop_claim(self, claimed: str) -> None:
+        try:
+            os.remove(claimed)
+        except FileNotFoundError:
+            # przejęcie zwolnione przez innego workera -> wiadomość może wyjść drugi raz
+            print(f"[MAIL] claim {os.path.basename(claimed)} was released by another worker")
+
+    async def _send_one(self, item: dict, path: str, claimed: str) -> None:
+        msg = email.message_from_string(item["message"], policy=email.policy.default)
+        try:
+            await asyncio.to_thread(self.sender.send, msg)
+        except Exception as e:
+            item["attempts"] = int(item.get("attempts", 0)) + 1
+            if item["attempts"] >= self.max_attempts:
+                os.makedirs(self.failed_dir, exist_ok=True)
+                self._write(os.path.join(self.failed_dir, os.path.basename(path)), item)
+                self._drop_claim(claimed)
+                print(f"[MAIL] giving up on {item['id']} after {item['attempts']} attempts", repr(e))
+                return
+
+            delay = min(self.max_delay, self.base_delay * 2 ** (item["attempts"] - 1))
+            item["next_try"] = time.time() + delay * random.uniform(0.8, 1.2)
+            self._write(path, item)
+            self._drop_claim(claimed)
+            print(f"[MAIL] send failed for {item['id']} (attempt {item['attempts']}), retry in {delay:.0f}s", repr(e))
+            return
+
+        self._drop_claim(claimed)
+        print(f"[MAIL] sent {item['id']}")
+
+    async def _step(self) -> None:
+        await asyncio.to_thread(self._release_orphans)
+
+        claimed, next_due = await asyncio.to_thread(self._claim_due)
+        if claimed is not None:
+            await self._send_one(*claimed)
+            return
+
+        await asyncio.to_thread(self.sender.close_if_idle)
+
+        self._wakeup.clear()
+        timeout = max(0.1, min(self.poll_interval, next_due - time.time()))
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._step()
+            except Exception as e:
+                # np. pełny dysk - worker nie może po cichu umrzeć, próbujemy dalej
+                print("[MAIL] worker error", repr(e))
+                await asyncio.sleep(self.poll_interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        await asyncio.to_thread(self.sender.close)
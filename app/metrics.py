@@ -0,0 +1,161 @@
+import functools
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# granice kubełków histogramów (ms); ostatni kubełek = powyżej
+DEFAULT_BUCKETS_MS: Tuple[float, ...] = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms: float) -> None:
+        self.counts[bisect_left(self.buckets, ms)] += 1
+        self.count += 1
+        self.sum_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def quantile(self, q: float) -> float:
+        # górna granica kubełka, w którym wypada kwantyl (dla ostatniego: max)
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return float(self.buckets[i]) if i < len(self.buckets) else self.max_ms
+        return self.max_ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        labels = [f"le_{b:g}" for b in self.buckets] + ["le_inf"]
+        return {
+            "count": self.count,
+            "avg_ms": round(self.sum_ms / self.count, 2) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 2),
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class RequestTimings:
+    """
+    Czasy etapów jednego requestu: nazwa -> (suma ms, liczba wywołań).
+    Etapy mogą się zagnieżdżać (np. "related" zawiera swoje "pb").
+    """
+
+    __slots__ = ("started", "spans")
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.spans: Dict[str, Tuple[float, int]] = {}
+
+    def add(self, name: str, ms: float) -> None:
+        total, n = self.spans.get(name, (0.0, 0))
+        self.spans[name] = (total + ms, n + 1)
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self, total_ms: float) -> str:
+        parts = [f'{name};dur={ms:.1f};desc="{n}x"' for name, (ms, n) in self.spans.items()]
+        parts.append(f"total;dur={total_ms:.1f}")
+        return ", ".join(parts)
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self.routes: Dict[str, Histogram] = {}
+        self.stages: Dict[str, Histogram] = {}
+        self.statuses: Dict[str, Dict[int, int]] = {}
+        self.started = time.time()
+
+    def observe_route(self, route: str, status_code: int, ms: float) -> None:
+        hist = self.routes.get(route)
+        if hist is None:
+            hist = self.routes[route] = Histogram()
+        hist.observe(ms)
+        by_status = self.statuses.setdefault(route, {})
+        by_status[status_code] = by_status.get(status_code, 0) + 1
+
+    def observe_stage(self, name: str, ms: float) -> None:
+        hist = self.stages.get(name)
+        if hist is None:
+            hist = self.stages[name] = Histogram()
+        hist.observe(ms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "uptime_s": round(time.time() - self.started),
+            "routes": {
+                route: {**hist.snapshot(), "statuses": self.statuses.get(route, {})}
+                for route, hist in sorted(self.routes.items())
+            },
+            "stages": {name: hist.snapshot() for name, hist in sorted(self.stages.items())},
+        }
+
+
+METRICS = Metrics()
+_CURRENT: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def start_request() -> RequestTimings:
+    timings = RequestTimings()
+    _CURRENT.set(timings)
+    return timings
+
+
+def current_request() -> Optional[RequestTimings]:
+    return _CURRENT.get()
+
+
+class _Span:
+    __slots__ = ("name", "t0")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.t0 = 0.0
+
+    def __enter__(self) -> "_Span":
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        ms = (time.perf_counter() - self.t0) * 1000
+        METRICS.observe_stage(self.name, ms)
+        timings = _CURRENT.get()
+        if timings is not None:
+            timings.add(self.name, ms)
+
+
+def span(name: str) -> _Span:
+    """
+    with span("pb"): ...  - mierzy etap; trafia do histogramu etapu i, w trakcie
+    requestu, do jego nagłówka Server-Timing. Nazwa = token (bez spacji).
+    """
+    return _Span(name)
+
+
+def timed(name: str) -> Callable[[Callable[..., Awaitable[T]]], Callable[..., Awaitable[T]]]:
+    # to samo co span(name) wokół całej korutyny
+    def decorator(fn: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        @functools.wraps(fn)
+        async def wrapper(*args: Any, **kwargs: Any) -> T:
+            with span(name):
+                return await fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
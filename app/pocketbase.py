@@ -0,0 +1,213 @@
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+import httpx
+
+# statusy, przy których GET ma sens ponowić (chwilowe przeciążenie / restart PocketBase)
+RETRY_STATUSES = {429, 502, 503, 504}
+
+
+class PocketBaseUnavailable(httpx.TransportError):
+    """
+    Bezpiecznik otwarty - nie wysyłamy requestu, tylko od razu zgłaszamy błąd.
+    Dziedziczy po httpx.TransportError, więc łapie się tam, gdzie błędy sieci.
+    """
+
+
+class CircuitBreaker:
+    """
+    closed -> po `threshold` kolejnych błędach: open (fail fast przez `reset_timeout` s)
+    open -> po czasie: half-open, przepuszczamy jedno zapytanie próbne
+    half-open -> sukces zamyka, błąd otwiera ponownie
+    """
+
+    def __init__(self, threshold: int = 5, reset_timeout: float = 15):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_inflight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if (time.monotonic() - self.opened_at) >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._probe_inflight:
+            self._probe_inflight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._probe_inflight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        probe, self._probe_inflight = self._probe_inflight, False
+        if probe or self.failures >= self.threshold:
+            if self.opened_at is None:
+                print(f"[PB] circuit open after {self.failures} failures")
+            self.opened_at = time.monotonic()
+
+    def release_probe(self) -> None:
+        # próba przerwana bez wyniku (np. anulowany request) -> kolejna może spróbować
+        self._probe_inflight = False
+
+
+class PocketBaseClient:
+    """
+    Wspólny klient HTTP do PocketBase:
+    - ograniczona pula połączeń (keep-alive), żeby wolny backend nie zjadał workerów
+    - krótkie timeouty (connect / read / czekanie na wolne połączenie z puli)
+    - GET ponawiamy z wykładniczym backoffem i jitterem, w ramach get_budget sekund
+      (zapisów nie - nie są idempotentne)
+    - bezpiecznik: po serii błędów sieci / 5xx od razu PocketBaseUnavailable,
+      handlery mogą wtedy oddać dane z cache
+    Odpowiedzi 4xx nie są błędem backendu; raise_for_status robi wywołujący.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        max_connections: int = 50,
+        max_keepalive: int = 20,
+        keepalive_expiry: float = 30,
+        connect_timeout: float = 2,
+        read_timeout: float = 5,
+        pool_timeout: float = 2,
+        get_retries: int = 2,
+        retry_base_delay: float = 0.1,
+        get_budget: float = 8,
+        breaker_threshold: int = 5,
+        breaker_reset: float = 15,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout, pool=pool_timeout)
+        self.get_retries = get_retries
+        self.retry_base_delay = retry_base_delay
+        self.get_budget = get_budget
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_reset)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=self.limits)
+        return self._client
+
+    async def _send_once(self, method: str, path: str, **kwargs: Any) -> httpx.Response:
+        if not self.breaker.allow():
+            raise PocketBaseUnavailable(f"PocketBase circuit open ({method} {path})")
+
+        try:
+            r = await self.client.request(method, path, **kwargs)
+        except httpx.TransportError:
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            self.breaker.release_probe()
+            raise
+
+        if r.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return r
+
+    async def request(self, method: str, path: str, timeout: Any = None, **kwargs: Any) -> httpx.Response:
+        """
+        timeout: budżet dla tego wywołania (sekundy albo httpx.Timeout), domyślnie z konstruktora.
+        """
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+
+        if method.upper() != "GET":
+            return await self._send_once(method, path, **kwargs)
+
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            try:
+                r = await self._send_once(method, path, **kwargs)
+                if r.status_code not in RETRY_STATUSES or attempt >= self.get_retries:
+                    return r
+                error: Optional[Exception] = None
+            except PocketBaseUnavailable:
+                raise
+            except httpx.TransportError as e:
+                if attempt >= self.get_retries:
+                    raise
+                error = e
+
+            attempt += 1
+            delay = self.retry_base_delay * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+            if (time.monotonic() - started + delay) > self.get_budget:
+                if error is not None:
+                    raise error
+                return r
+            await asyncio.sleep(delay)
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class RequestCoalescer:
+    """
+    Sklejanie identycznych zapytań w locie: pierwszy wywołujący (leader) wykonuje
+    zapytanie, kolejni z tym samym kluczem czekają na ten sam wynik (albo wyjątek).
+    Zadanie leadera jest osłonięte - anulowanie jednego wywołującego nie psuje pozostałych.
+    Wynik jest współdzielony, więc powinien być niemutowalny (np. httpx.Response,
+    z której każdy robi własne .json()).
+    """
+
+    def __init__(self) -> None:
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.leaders = 0
+        self.absorbed = 0
+
+    async def run(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        fut = self._inflight.get(key)
+        if fut is not None:
+            self.absorbed += 1
+            return await asyncio.shield(fut)
+
+        self.leaders += 1
+        fut = asyncio.ensure_future(call())
+        self._inflight[key] = fut
+
+        def _done(f: asyncio.Future) -> None:
+            if self._inflight.get(key) is f:
+                del self._inflight[key]
+            if not f.cancelled():
+                f.exception()  # oznacz jako odebrany, gdy nikt już nie czeka
+
+        fut.add_done_callback(_done)
+        return await asyncio.shield(fut)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.leaders + self.absorbed
+        return {
+            "calls": total,
+            "sent": self.leaders,
+            "absorbed": self.absorbed,
+            "absorbed_ratio": round(self.absorbed / total, 3) if total else 0.0,
+            "inflight": len(self._inflight),
+        }
@@ -0,0 +1,140 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Protocol
+
+
+class RateLimiter(Protocol):
+    """
+    Cooldown per klucz: hit(key, window) blokuje klucz na `window` sekund,
+    retry_after(key) mówi, ile sekund jeszcze zostało (0 = wolno).
+    """
+
+    async def retry_after(self, key: str) -> float: ...
+
+    async def hit(self, key: str, window: float) -> None: ...
+
+    async def count(self) -> int: ...
+
+    async def aclose(self) -> None: ...
+
+
+class MemoryRateLimiter:
+    """
+    W pamięci procesu. Przy kilku workerach uvicorna każdy ma własny stan,
+    więc nadaje się do pracy lokalnej / jednego workera.
+    Wygasłe klucze sprzątamy co sweep_interval sekund (słownik nie rośnie bez końca).
+    """
+
+    def __init__(self, sweep_interval: float = 60):
+        self.sweep_interval = sweep_interval
+        self._expires: Dict[str, float] = {}
+        self._last_sweep = time.time()
+
+    def _sweep(self, now: float) -> None:
+        if (now - self._last_sweep) < self.sweep_interval:
+            return
+        self._last_sweep = now
+        for k in [k for k, exp in self._expires.items() if exp <= now]:
+            del self._expires[k]
+
+    def __len__(self) -> int:
+        return len(self._expires)
+
+    async def count(self) -> int:
+        # aktywne cooldowny (bez czekających na sprzątanie)
+        now = time.time()
+        return sum(1 for exp in self._expires.values() if exp > now)
+
+    async def retry_after(self, key: str) -> float:
+        now = time.time()
+        self._sweep(now)
+        return max(0.0, self._expires.get(key, 0.0) - now)
+
+    async def hit(self, key: str, window: float) -> None:
+        now = time.time()
+        self._sweep(now)
+        self._expires[key] = now + window
+
+    async def aclose(self) -> None:
+        self._expires.clear()
+
+
+class SQLiteRateLimiter:
+    """
+    Wspólny plik SQLite (WAL) - wszystkie workery na tej samej maszynie widzą
+    ten sam stan, a cooldowny przeżywają restart. Zapytania idą w wątku.
+    """
+
+    def __init__(self, path: str, sweep_interval: float = 60 * 5):
+        self.path = path
+        self.sweep_interval = sweep_interval
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS cooldowns (key TEXT PRIMARY KEY, expires_at REAL NOT NULL)")
+            self._conn = conn
+        return self._conn
+
+    def _sweep(self, db: sqlite3.Connection, now: float) -> None:
+        if (now - self._last_sweep) < self.sweep_interval:
+            return
+        self._last_sweep = now
+        db.execute("DELETE FROM cooldowns WHERE expires_at <= ?", (now,))
+
+    def _retry_after_sync(self, key: str) -> float:
+        with self._lock:
+            row = self._db().execute("SELECT expires_at FROM cooldowns WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return 0.0
+        return max(0.0, row[0] - time.time())
+
+    def _hit_sync(self, key: str, window: float) -> None:
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT INTO cooldowns (key, expires_at) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET expires_at = excluded.expires_at",
+                (key, now + window),
+            )
+            self._sweep(db, now)
+
+    def _count_sync(self) -> int:
+        with self._lock:
+            return self._db().execute("SELECT COUNT(*) FROM cooldowns WHERE expires_at > ?", (time.time(),)).fetchone()[0]
+
+    async def count(self) -> int:
+        return await asyncio.to_thread(self._count_sync)
+
+    async def retry_after(self, key: str) -> float:
+        return await asyncio.to_thread(self._retry_after_sync, key)
+
+    async def hit(self, key: str, window: float) -> None:
+        await asyncio.to_thread(self._hit_sync, key, window)
+
+    async def aclose(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def make_rate_limiter(kind: str, sqlite_path: str) -> RateLimiter:
+    kind = (kind or "").strip().lower()
+    if kind == "sqlite":
+        return SQLiteRateLimiter(sqlite_path)
+    if kind == "memory":
+        return MemoryRateLimiter()
+    raise RuntimeError(f"Unknown RATE_LIMIT_BACKEND: {kind!r} (expected 'sqlite' or 'memory')")
@@ -0,0 +1,147 @@
+import math
+from bisect import bisect_left
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+
+class SearchIndex:
+    """
+    Indeks odwrócony w pamięci z rankingiem BM25.
+    - tokenize: ta sama funkcja dla dokumentów i zapytań (normalizacja po stronie wywołującego)
+    - tytuł liczony jest title_weight razy (prosty boost pola)
+    - każde słowo zapytania od min_prefix znaków działa jak prefiks ("pyt" trafia też
+      w "python"), krótsze tylko dokładnie; prefiks rozwija się w co najwyżej
+      max_expansions termów (koszt zapytania nie rośnie ze słownikiem)
+    - dokument musi pasować do wszystkich słów zapytania
+    """
+
+    def __init__(
+        self,
+        tokenize: Callable[[str], List[str]],
+        k1: float = 1.2,
+        b: float = 0.75,
+        title_weight: int = 3,
+        min_prefix: int = 3,
+        max_expansions: int = 50,
+    ):
+        self.tokenize = tokenize
+        self.k1 = k1
+        self.b = b
+        self.title_weight = title_weight
+        self.min_prefix = min_prefix
+        self.max_expansions = max_expansions
+
+        self._postings: Dict[str, Dict[str, int]] = {}  # term -> {doc_id: tf}
+        self._doc_terms: Dict[str, Set[str]] = {}  # doc_id -> termy (do usuwania)
+        self._doc_len: Dict[str, int] = {}
+        self._total_len = 0
+        self._vocab: List[str] = []  # posortowane termy (prefiksy przez bisect)
+        self._vocab_dirty = False
+        self.meta: Dict[str, Any] = {}  # doc_id -> dowolne dane wywołującego
+
+    def __len__(self) -> int:
+        return len(self._doc_len)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._doc_len
+
+    def upsert(self, doc_id: str, title: str, body: str, meta: Any = None) -> None:
+        self.remove(doc_id)
+
+        tf: Counter = Counter(self.tokenize(body))
+        for t in self.tokenize(title):
+            tf[t] += self.title_weight
+
+        for term, n in tf.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                self._vocab_dirty = True
+            postings[doc_id] = n
+
+        length = sum(tf.values())
+        self._doc_terms[doc_id] = set(tf)
+        self._doc_len[doc_id] = length
+        self._total_len += length
+        self.meta[doc_id] = meta
+
+    def remove(self, doc_id: str) -> None:
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[term]
+                self._vocab_dirty = True
+
+        self._total_len -= self._doc_len.pop(doc_id, 0)
+        self.meta.pop(doc_id, None)
+
+    def clear(self) -> None:
+        self._postings.clear()
+        self._doc_terms.clear()
+        self._doc_len.clear()
+        self._total_len = 0
+        self._vocab = []
+        self._vocab_dirty = False
+        self.meta.clear()
+
+    def _expand(self, token: str) -> List[str]:
+        if len(token) < self.min_prefix:
+            return [token] if token in self._postings else []
+
+        if self._vocab_dirty:
+            self._vocab = sorted(self._postings)
+            self._vocab_dirty = False
+
+        out: List[str] = []
+        i = bisect_left(self._vocab, token)
+        # pierwszy jest sam token (jeśli jest w słowniku), dalej alfabetycznie
+        while i < len(self._vocab) and self._vocab[i].startswith(token) and len(out) < self.max_expansions:
+            out.append(self._vocab[i])
+            i += 1
+        return out
+
+    def search(self, query: str, sort_key: Optional[Callable[[str], Any]] = None) -> List[Tuple[str, float]]:
+        """
+        Zwraca [(doc_id, score)] malejąco po score.
+        sort_key(doc_id) rozstrzyga remisy (większy = wyżej), np. data utworzenia.
+        """
+        tokens = list(dict.fromkeys(self.tokenize(query)))
+        n_docs = len(self._doc_len)
+        if not tokens or not n_docs:
+            return []
+
+        avg_len = self._total_len / n_docs
+        scores: Optional[Dict[str, float]] = None
+
+        for token in tokens:
+            # dla jednego słowa zapytania bierzemy najlepiej pasujący term w dokumencie
+            best: Dict[str, float] = {}
+            for term in self._expand(token):
+                postings = self._postings[term]
+                df = len(postings)
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_len[doc_id] / avg_len)
+                    s = idf * tf * (self.k1 + 1) / (tf + norm)
+                    if s > best.get(doc_id, 0.0):
+                        best[doc_id] = s
+
+            if scores is None:
+                scores = best
+            else:
+                scores = {d: s + best[d] for d, s in scores.items() if d in best}
+            if not scores:
+                return []
+
+        ranked = list(scores.items())
+        if sort_key is not None:
+            ranked.sort(key=lambda x: sort_key(x[0]), reverse=True)
+        ranked.sort(key=lambda x: x[1], reverse=True)
+        return ranked
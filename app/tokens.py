@@ -0,0 +1,98 @@
+import asyncio
+import base64
+import json
+import time
+from typing import Awaitable, Callable, Optional
+
+
+def jwt_exp(token: str) -> Optional[float]:
+    """
+    Czas wygaśnięcia (unix ts) z pola `exp` JWT albo None.
+    Podpisu nie sprawdzamy - token dostajemy prosto od PocketBase.
+    """
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload)).get("exp")
+        return float(exp) if exp is not None else None
+    except (IndexError, ValueError, TypeError, AttributeError):
+        return None
+
+
+class ServiceTokenManager:
+    """
+    Token konta serwisowego PocketBase.
+    - ważność z `exp` w JWT (fallback_ttl, gdy tokena nie da się odczytać)
+    - refresh_margin sekund przed wygaśnięciem odświeżamy w tle, requesty dalej
+      dostają stary (jeszcze ważny) token
+    - równoległe logowania sklejamy w jedno (single-flight)
+    - invalidate(token) po 401: kolejne get() zaloguje się od nowa
+    """
+
+    def __init__(
+        self,
+        login: Callable[[], Awaitable[str]],
+        refresh_margin: float = 60 * 5,
+        fallback_ttl: float = 60 * 30,
+        min_validity: float = 10,
+    ):
+        self._login = login
+        self.refresh_margin = refresh_margin
+        self.fallback_ttl = fallback_ttl
+        self.min_validity = min_validity
+
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._inflight: Optional[asyncio.Future] = None
+
+    @property
+    def expires_at(self) -> float:
+        return self._expires_at
+
+    def _valid(self, now: float) -> bool:
+        return self._token is not None and now < (self._expires_at - self.min_validity)
+
+    def _refresh_due(self, now: float) -> bool:
+        return self._token is None or now >= (self._expires_at - self.refresh_margin)
+
+    async def _do_login(self) -> str:
+        token = await self._login()
+        exp = jwt_exp(token)
+        self._token = token
+        self._expires_at = exp if exp is not None else time.time() + self.fallback_ttl
+        return token
+
+    def _start_login(self) -> asyncio.Future:
+        if self._inflight is None:
+            fut = asyncio.ensure_future(self._do_login())
+
+            def _done(f: asyncio.Future) -> None:
+                if self._inflight is f:
+                    self._inflight = None
+                if not f.cancelled() and f.exception() is not None:
+                    print("[TOKEN] service login failed", repr(f.exception()))
+
+            fut.add_done_callback(_done)
+            self._inflight = fut
+        return self._inflight
+
+    async def get(self) -> str:
+        now = time.time()
+        if self._valid(now):
+            if self._refresh_due(now):
+                self._start_login()  # w tle, bez czekania
+            return self._token  # type: ignore[return-value]
+
+        # shield: anulowany request nie przerywa logowania, na które czekają inni
+        return await asyncio.shield(self._start_login())
+
+    async def refresh_if_due(self) -> None:
+        # dla schedulera: nieużywany worker też ma świeży token
+        if self._refresh_due(time.time()):
+            await asyncio.shield(self._start_login())
+
+    def invalidate(self, token: str) -> None:
+        # tylko jeśli to wciąż bieżący token (inny request mógł już go wymienić)
+        if token == self._token:
+            self._token = None
+            self._expires_at = 0.0
@@ -2,7 +2,7 @@ from __future__ import annotations
 from dotenv import load_dotenv
 load_dotenv()
 from fastapi import APIRouter, FastAPI, HTTPException, Request, status, Query, Form, Path
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from starlette.exceptions import HTTPException as StarletteHTTPException
@@ -11,15 +11,17 @@ from urllib.parse import urlencode
 from urllib.parse import quote_plus
 from html import unescape
 from math import ceil
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 from zoneinfo import ZoneInfo
 from email.message import EmailMessage
 from bs4 import BeautifulSoup
 from collections import Counter
 import httpx
 import uuid
+import functools
+import hashlib
+import heapq
 import unicodedata
-import smtplib
 import asyncio
 import time
 import secrets
@@ -27,12 +29,20 @@ import re
 import time
 from app.config import (
     PB_URL,
+    PB_MAX_CONNECTIONS,
+    PB_MAX_KEEPALIVE,
+    PB_CONNECT_TIMEOUT,
+    PB_READ_TIMEOUT,
+    PB_GET_RETRIES,
+    PB_BREAKER_THRESHOLD,
+    PB_BREAKER_RESET,
     POSTS_COLLECTION,
     COMMENTS_COLLECTION,
     SERIES_COLLECTION,
     SERVICE_COLLECTION,
     RECAPTCHA_SITE_KEY,
     RECAPTCHA_SECRET_KEY,
+    RECAPTCHA_VERIFIER,
     PB_SERVICE_EMAIL,
     PB_SERVICE_PASSWORD,
     SMTP_HOST,
@@ -41,31 +51,68 @@ from app.config import (
     SMTP_PASS,
     CONTACT_TO,
     CONTACT_FROM,
+    MAIL_SPOOL_DIR,
+    RATE_LIMIT_BACKEND,
+    RATE_LIMIT_DB,
+    ADMIN_TOKEN,
+)
+from app.cache import MISSING, CacheStats, TTLCache, approx_size
+from app.mailer import MailQueue, SMTPSender
+from app.metrics import METRICS, current_request, span, start_request, timed
+from app.pocketbase import PocketBaseClient, RequestCoalescer
+from app.ratelimit import make_rate_limiter
+from app.recaptcha import make_recaptcha_verifier
+from app.search import SearchIndex
+from app.tokens import ServiceTokenManager
+
+# --- HTTP client reuse (one PocketBase client / connection pool per process) ---
+_PB = PocketBaseClient(
+    PB_URL,
+    max_connections=PB_MAX_CONNECTIONS,
+    max_keepalive=PB_MAX_KEEPALIVE,
+    connect_timeout=PB_CONNECT_TIMEOUT,
+    read_timeout=PB_READ_TIMEOUT,
+    get_retries=PB_GET_RETRIES,
+    breaker_threshold=PB_BREAKER_THRESHOLD,
+    breaker_reset=PB_BREAKER_RESET,
 )
 
-# --- HTTP client reuse (one AsyncClient per process) ---
-_HTTP_CLIENT: httpx.AsyncClient | None = None
+# identyczne GET-y w locie (ta sama ścieżka + parametry) idą do PocketBase raz
+_PB_GET_COALESCER = RequestCoalescer()
 
 async def get_http_client() -> httpx.AsyncClient:
-    global _HTTP_CLIENT
-    if _HTTP_CLIENT is None:
-        _HTTP_CLIENT = httpx.AsyncClient(timeout=15)
-    return _HTTP_CLIENT
+    return _PB.client
 
 async def close_http_client() -> None:
-    global _HTTP_CLIENT
-    if _HTTP_CLIENT is not None:
-        await _HTTP_CLIENT.aclose()
-        _HTTP_CLIENT = None
+    await _PB.aclose()
+
+PB_STATS_LOG_INTERVAL = 60 * 5
+
+async def log_pb_stats() -> None:
+    st = _PB_GET_COALESCER.stats()
+    print(
+        f"[PB] get calls={st['calls']} sent={st['sent']} absorbed={st['absorbed']} "
+        f"({st['absorbed_ratio']:.1%}) breaker={_PB.breaker.state}"
+    )
 
 app = FastAPI()
 
 @app.on_event("startup")
 async def startup_http_client() -> None:
     await get_http_client()
+    await warm_up_caches()
+    start_scheduler()
+    _MAIL_QUEUE.start()
 
 @app.on_event("shutdown")
 async def shutdown_http_client() -> None:
+    # najpierw zadania w tle (korzystają z klienta HTTP)
+    await stop_scheduler()
+    await _MAIL_QUEUE.stop()
+    # bufor wyświetleń nie może przepaść przy restarcie
+    await flush_post_views()
+    await _RECAPTCHA.aclose()
+    await _RATE_LIMITER.aclose()
     await close_http_client()
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -75,9 +122,7 @@ templates.env.filters["urlencode"] = lambda s: quote_plus(str(s))
 
 router = APIRouter()
 
-_SERVICE_TOKEN: str | None = None
-_SERVICE_TOKEN_TS: float = 0.0
-_SERVICE_TOKEN_TTL = 60 * 30  # 30 min (prosto; potem można lepiej)
+SERVICE_TOKEN_CHECK_INTERVAL = 60
 
 VISITOR_COOKIE_NAME = "visitor_id"
 VISITOR_COOKIE_MAX_AGE = 60 * 60 * 24 * 365  # 1 rok
@@ -86,6 +131,9 @@ WARSAW_TZ = ZoneInfo("Europe/Warsaw")
 
 COMMENT_COOLDOWN_SECONDS = 300
 
+# cooldowny kontaktu i komentarzy; backend sqlite jest wspólny dla wszystkich workerów
+_RATE_LIMITER = make_rate_limiter(RATE_LIMIT_BACKEND, RATE_LIMIT_DB)
+
 @app.middleware("http")
 async def ensure_visitor_id_cookie(request: Request, call_next):
     response = await call_next(request)
@@ -106,15 +154,38 @@ async def ensure_visitor_id_cookie(request: Request, call_next):
     )
     return response
 
+# musi być zadeklarowany po pozostałych middleware -> jest najbardziej zewnętrzny i mierzy całość
+@app.middleware("http")
+async def request_timing(request: Request, call_next):
+    timings = start_request()
+    # wyjątek z handlera przechodzi przez call_next (strona 500 powstaje w ServerErrorMiddleware,
+    # poza tym middleware) -> liczymy go jako 500; Server-Timing dopisuje internal_error_handler
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        response.headers["Server-Timing"] = timings.server_timing(timings.elapsed_ms())
+        return response
+    finally:
+        if not request.url.path.startswith("/static/"):
+            # szablon ścieżki (/post/{slug}), nie konkretny URL -> skończona liczba histogramów
+            route = request.scope.get("route")
+            METRICS.observe_route(
+                f"{request.method} {getattr(route, 'path', None) or 'unmatched'}",
+                status_code,
+                timings.elapsed_ms(),
+            )
+
 @app.exception_handler(StarletteHTTPException)
 async def http_exception_handler(request: Request, exc: StarletteHTTPException):
     if exc.status_code == status.HTTP_404_NOT_FOUND:
         base = await public_context(request)  # <-- widgety
-        return app.state.templates.TemplateResponse(
-            "404.html",
-            {"request": request, **base, "context_name": "404"},
-            status_code=404,
-        )
+        with span("render"):
+            return app.state.templates.TemplateResponse(
+                "404.html",
+                {"request": request, **base, "context_name": "404"},
+                status_code=404,
+            )
 
     return HTMLResponse(content=str(exc.detail), status_code=exc.status_code)
 
@@ -124,11 +195,16 @@ async def internal_error_handler(request: Request, exc: Exception):
     print(f"500 ERROR [{error_id}]:", repr(exc))
 
     base = await public_context(request)  # <-- widgety
-    return app.state.templates.TemplateResponse(
-        "500.html",
-        {"request": request, **base, "error_id": error_id, "context_name": "500"},
-        status_code=500,
-    )
+    with span("render"):
+        response = app.state.templates.TemplateResponse(
+            "500.html",
+            {"request": request, **base, "error_id": error_id, "context_name": "500"},
+            status_code=500,
+        )
+    timings = current_request()
+    if timings is not None:
+        response.headers["Server-Timing"] = timings.server_timing(timings.elapsed_ms())
+    return response
 
 async def pb_login_service() -> str:
     if not PB_SERVICE_EMAIL or not PB_SERVICE_PASSWORD:
@@ -144,17 +220,11 @@ async def pb_login_service() -> str:
         raise RuntimeError("PocketBase login did not return token")
     return token
 
-async def get_service_token() -> str:
-    global _SERVICE_TOKEN, _SERVICE_TOKEN_TS
-    now = time.time()
-
-    if _SERVICE_TOKEN and (now - _SERVICE_TOKEN_TS) < _SERVICE_TOKEN_TTL:
-        return _SERVICE_TOKEN
+# ważność z `exp` w JWT, odświeżanie przed wygaśnięciem, jedno logowanie naraz
+_SERVICE_TOKENS = ServiceTokenManager(pb_login_service)
 
-    token = await pb_login_service()
-    _SERVICE_TOKEN = token
-    _SERVICE_TOKEN_TS = now
-    return token
+async def get_service_token() -> str:
+    return await _SERVICE_TOKENS.get()
 
 def pb_escape(s: str) -> str:
     # PocketBase filter używa cudzysłowów -> uciekamy "
@@ -275,23 +345,6 @@ def format_pl_date(date_str: str) -> str:
         
 COMMENT_COOLDOWN_SECONDS = 300
 
-async def get_last_comment_utc_for_post(visitor_id: str, post_id: str) -> datetime | None:
-    data = await pb_get(
-        f"/api/collections/{COMMENTS_COLLECTION}/records",
-        params={
-            "page": 1,
-            "perPage": 1,
-            "sort": "-created",
-            "filter": f'(visitor_id="{visitor_id}") && (post="{post_id}")',
-            "fields": "created",
-        },
-    )
-    items = data.get("items") or []
-    if not items:
-        return None
-    return pb_dt_to_utc(items[0].get("created"))
-
-
 def lazy_images(html: str) -> str:
     """
     Dodaje loading="lazy" i decoding="async" do <img>, jeśli nie ma.
@@ -371,6 +424,7 @@ def _parse_dt(s: str | None) -> datetime | None:
     except Exception:
         return None
 
+@timed("related")
 async def get_related_posts(post: dict, limit: int = 6) -> list[dict]:
     """
     Automatycznie dobiera podobne posty:
@@ -383,6 +437,12 @@ async def get_related_posts(post: dict, limit: int = 6) -> list[dict]:
     category = (post.get("category") or "").strip()
     tags = set(_as_list(post.get("tags")))
 
+    # 0) gotowy indeks (budowany w tle) -> zwykły lookup
+    if _POST_CATALOG_TS and limit <= RELATED_LIMIT:
+        hit = _RELATED_INDEX.get(post_id)
+        if hit is not None:
+            return hit[:limit]
+
     # 1) pobierz kandydatów z tej samej kategorii (dużo jakości za mało zapytań)
     candidates = []
     if category:
@@ -422,48 +482,412 @@ async def get_related_posts(post: dict, limit: int = 6) -> list[dict]:
 
     # 3) scoring
     now = datetime.now(timezone.utc)
+    candidates.sort(key=lambda p: _related_score(category, tags, p, now), reverse=True)
+    return candidates[:limit]
 
-    def score(p: dict) -> float:
-        s = 0.0
+def _related_base_score(p: dict, now: datetime) -> float:
+    # część punktacji niezależna od posta, dla którego szukamy podobnych
+    s = 0.0
 
-        # kategoria
-        if category and (p.get("category") or "").strip() == category:
-            s += 100.0
+    # popularność
+    try:
+        s += min(float(p.get("views") or 0), 1000.0) * 0.02  # do +20 pkt
+    except Exception:
+        pass
+
+    # świeżość (delikatnie)
+    dt = _parse_dt(p.get("created"))
+    if dt:
+        days = max((now - dt).days, 0)
+        s += max(0.0, 20.0 - min(days, 400) * 0.05)  # do +20, spada powoli
+
+    return s
+
+def _related_score(category: str, tags: set, p: dict, now: datetime) -> float:
+    s = _related_base_score(p, now)
+
+    # kategoria
+    if category and (p.get("category") or "").strip() == category:
+        s += 100.0
+
+    # tagi wspólne
+    ptags = set(_as_list(p.get("tags")))
+    common = len(tags & ptags) if tags else 0
+    s += common * 15.0
+
+    return s
+
+# --------- POST CATALOG (related posts + tagi) ---------
+# Katalog opublikowanych postów (same pola potrzebne do scoringu) + indeksy z niego liczone:
+# - gotowe top-N podobnych per post
+# - tag -> id postów (dokładne dopasowanie, od najnowszych)
+# - agregaty do sidebaru: kategorie, liczba postów (popularne tagi = długości list z _TAG_INDEX)
+# Budowany w tle jednym skanem (stronicowanie, bez limitu rekordów); widoki robią tylko lookup.
+
+_RELATED_FIELDS = "id,slug,title,category,tags,series,views,created"
+RELATED_LIMIT = 6
+POST_CATALOG_INTERVAL = 60 * 5
+
+_POST_CATALOG: Dict[str, Dict[str, Any]] = {}  # id -> rekord z _RELATED_FIELDS
+_RELATED_INDEX: Dict[str, List[Dict[str, Any]]] = {}  # id -> top-N podobnych
+# id -> (wpis, kategoria, zbiór tagów, wynik bazowy); liczone raz na wpis, nie na parę postów
+_RELATED_PREPARED: Dict[str, Tuple[Dict[str, Any], str, frozenset, float]] = {}
+_TAG_INDEX: Dict[str, List[str]] = {}  # tag -> id postów, od najnowszego
+_CATALOG_CATEGORIES: List[str] = []  # posortowane
+# klucz listy (np. "category:x") -> [(created, id)] od najnowszego; liczone leniwie, czyszczone przy przebudowie
+_LIST_ORDER_CACHE: Dict[str, List[Tuple[str, str]]] = {}
+_POST_CATALOG_TS: float = 0.0
+_POST_CATALOG_LOCK = asyncio.Lock()
+_POST_CATALOG_REPLAY: Dict[str, Dict[str, Any]] | None = None  # upserty w trakcie przebudowy
+
+async def _scan_records(collection: str, flt: str, fields: str, sort: str, per_page: int = 200) -> List[Dict[str, Any]]:
+    out: List[Dict[str, Any]] = []
+    page = 1
 
-        # tagi wspólne
-        ptags = set(_as_list(p.get("tags")))
-        common = len(tags & ptags) if tags else 0
-        s += common * 15.0
+    while True:
+        data = await pb_get(
+            f"/api/collections/{collection}/records",
+            params={
+                "page": page,
+                "perPage": per_page,
+                "sort": sort,
+                "filter": flt,
+                "fields": fields,
+            },
+        )
 
-        # popularność
-        try:
-            s += min(float(p.get("views") or 0), 1000.0) * 0.02  # do +20 pkt
-        except Exception:
-            pass
+        out.extend(data.get("items") or [])
 
-        # świeżość (delikatnie)
-        dt = _parse_dt(p.get("created"))
-        if dt:
-            days = max((now - dt).days, 0)
-            s += max(0.0, 20.0 - min(days, 400) * 0.05)  # do +20, spada powoli
+        if page >= data.get("totalPages", 1):
+            break
+        page += 1
 
-        return s
+    return out
 
-    candidates.sort(key=score, reverse=True)
-    return candidates[:limit]
+# pola katalogu, których zmiana nie przelicza indeksów od razu (łapie je okresowa przebudowa)
+_CATALOG_VOLATILE_FIELDS = {"views"}
+
+def _related_prepare(p: Dict[str, Any], now: datetime) -> Tuple[Dict[str, Any], str, frozenset, float]:
+    return p, (p.get("category") or "").strip(), frozenset(_as_list(p.get("tags"))), _related_base_score(p, now)
+
+def _related_ordered(prepared: Any) -> List[Tuple[Dict[str, Any], str, frozenset, float]]:
+    # kolejność jak w starym zapytaniu (-views,-created) -> remisy rozstrzygają się tak samo
+    return sorted(
+        prepared,
+        key=lambda t: (float(t[0].get("views") or 0), t[0].get("created") or ""),
+        reverse=True,
+    )
+
+def _related_candidate_score(category: str, tags: frozenset, cand: Tuple[Dict[str, Any], str, frozenset, float]) -> float:
+    # to samo co _related_score, na gotowych polach kandydata
+    _, ccat, ctags, base = cand
+    return base + (100.0 if category and ccat == category else 0.0) + len(tags & ctags) * 15.0
+
+def _related_top(pid: str, category: str, tags: frozenset, ordered: List[Tuple[Dict[str, Any], str, frozenset, float]]) -> List[Dict[str, Any]]:
+    scored = (
+        (_related_candidate_score(category, tags, cand), cand[0])
+        for cand in ordered
+        if cand[0].get("id") != pid
+    )
+    return [p for _, p in heapq.nlargest(RELATED_LIMIT, scored, key=lambda x: x[0])]
+
+def _compute_related_index(
+    entries: List[Dict[str, Any]],
+) -> Tuple[Dict[str, List[Dict[str, Any]]], Dict[str, Tuple[Dict[str, Any], str, frozenset, float]]]:
+    # czyste obliczenie na liście wpisów (bez globali) - O(n^2), przy przebudowie idzie w wątku
+    now = datetime.now(timezone.utc)
+    ordered = _related_ordered(_related_prepare(p, now) for p in entries)
+    index = {p["id"]: _related_top(p["id"], category, tags, ordered) for p, category, tags, _ in ordered}
+    return index, {t[0]["id"]: t for t in ordered}
+
+def _related_apply(pid: str, entry: Dict[str, Any] | None) -> None:
+    """
+    Jeden post zmieniony (entry) albo zniknął (None) -> poprawiamy tylko dotknięte listy:
+    - własną listę posta liczymy od nowa
+    - lista, na której post był: od nowa (jego wynik mógł spaść)
+    - pozostałe: post wchodzi tylko, jeśli bije najsłabszy wpis (reszta wyników bez zmian)
+    """
+    now = datetime.now(timezone.utc)
+    _RELATED_PREPARED.pop(pid, None)
+    _RELATED_INDEX.pop(pid, None)
+    new = None
+    if entry is not None:
+        new = _related_prepare(entry, now)
+        _RELATED_PREPARED[pid] = new
+
+    ordered: List[Tuple[Dict[str, Any], str, frozenset, float]] | None = None
+    for qid, (_, qcat, qtags, _) in list(_RELATED_PREPARED.items()):
+        if qid == pid:
+            continue
+        cur = _RELATED_INDEX.get(qid) or []
+        if any(c.get("id") == pid for c in cur) or any(c.get("id") not in _RELATED_PREPARED for c in cur):
+            if ordered is None:
+                ordered = _related_ordered(_RELATED_PREPARED.values())
+            _RELATED_INDEX[qid] = _related_top(qid, qcat, qtags, ordered)
+            continue
+        if new is None:
+            continue
+
+        score = _related_candidate_score(qcat, qtags, new)
+        scored = [(_related_candidate_score(qcat, qtags, _RELATED_PREPARED[c["id"]]), c) for c in cur]
+        if len(scored) < RELATED_LIMIT or score > min(sc for sc, _ in scored):
+            scored.append((score, entry))
+            _RELATED_INDEX[qid] = [c for _, c in heapq.nlargest(RELATED_LIMIT, scored, key=lambda x: x[0])]
+
+    if new is not None:
+        if ordered is None:
+            ordered = _related_ordered(_RELATED_PREPARED.values())
+        _RELATED_INDEX[pid] = _related_top(pid, new[1], new[2], ordered)
+
+def _rebuild_tag_index() -> None:
+    index: Dict[str, List[str]] = {}
+    for p in sorted(_POST_CATALOG.values(), key=lambda p: p.get("created") or "", reverse=True):
+        for tag in dict.fromkeys(_as_list(p.get("tags"))):
+            index.setdefault(tag, []).append(p["id"])
+
+    _TAG_INDEX.clear()
+    _TAG_INDEX.update(index)
+
+def _rebuild_catalog_aggregates() -> None:
+    cats = {c for c in ((p.get("category") or "") for p in _POST_CATALOG.values()) if c}
+    _CATALOG_CATEGORIES[:] = sorted(cats)
 
-def calc_reading_time_minutes(html_content: str, wpm: int = 200) -> int:
+async def rebuild_post_catalog() -> None:
+    global _POST_CATALOG_TS, _POST_CATALOG_REPLAY
+
+    # zmiany posta w trakcie skanu/liczenia trafiłyby do starego katalogu -> powtarzamy je po podmianie
+    replay: Dict[str, Dict[str, Any]] = {}
+    _POST_CATALOG_REPLAY = replay
+    try:
+        items = await _scan_records(POSTS_COLLECTION, "published=true", _RELATED_FIELDS, "-created")
+        fresh = {it["id"]: it for it in items if it.get("id")}
+        # scoring O(n^2) w wątku - pętla zdarzeń obsługuje w tym czasie requesty
+        related, prepared = await asyncio.to_thread(_compute_related_index, list(fresh.values()))
+    finally:
+        _POST_CATALOG_REPLAY = None
+
+    _POST_CATALOG.clear()
+    _POST_CATALOG.update(fresh)
+    _RELATED_INDEX.clear()
+    _RELATED_INDEX.update(related)
+    _RELATED_PREPARED.clear()
+    _RELATED_PREPARED.update(prepared)
+    _rebuild_tag_index()
+    _rebuild_catalog_aggregates()
+    _LIST_ORDER_CACHE.clear()
+    _POST_CATALOG_TS = time.time()
+
+    for raw in replay.values():
+        post_catalog_upsert(raw)
+
+    # widgety liczone z katalogu od razu dostają nowy stan (bez czekania na swój TTL)
+    for name in _CATALOG_WIDGETS:
+        key, _, loader = _PUBLIC_WIDGETS[name]
+        _cache_set(key, await loader())
+
+async def ensure_post_catalog() -> None:
+    # pierwszy widok przed zbudowaniem katalogu (np. nieudany warm-up) -> jeden skan dla wszystkich
+    if _POST_CATALOG_TS:
+        return
+    async with _POST_CATALOG_LOCK:
+        if not _POST_CATALOG_TS:
+            await rebuild_post_catalog()
+
+def post_catalog_upsert(raw: Dict[str, Any]) -> None:
+    # wołane, gdy dostaliśmy świeży rekord posta (np. po edycji)
+    pid = raw.get("id")
+    if not pid:
+        return
+    if _POST_CATALOG_REPLAY is not None:
+        _POST_CATALOG_REPLAY[pid] = raw
+    if not _POST_CATALOG_TS:
+        return
+
+    entry = {f: raw.get(f) for f in _RELATED_FIELDS.split(",")}
+    published = bool(raw.get("published", True))
+    old = _POST_CATALOG.get(pid)
+    if old is None and not published:
+        return
+    if published and old is not None and all(
+        old.get(f) == v for f, v in entry.items() if f not in _CATALOG_VOLATILE_FIELDS
+    ):
+        # same wyświetlenia zmieniają się przy niemal każdym odczycie -> zostawiamy przebudowie
+        return
+
+    if published:
+        _POST_CATALOG[pid] = entry
+        _related_apply(pid, entry)
+    else:
+        _POST_CATALOG.pop(pid, None)
+        _related_apply(pid, None)
+    _rebuild_tag_index()
+    _rebuild_catalog_aggregates()
+    _LIST_ORDER_CACHE.clear()
+
+def html_word_count(html_content: str) -> int:
     if not html_content:
-        return 1
+        return 0
+    text = unescape(_TAG_RE.sub(" ", html_content))
+    return len(re.findall(r"\S+", text))
+
+def reading_time_from_words(words: int, wpm: int = 200) -> int:
+    return max(1, ceil(words / max(wpm, 1)))
+
+def html_excerpt(html_content: str, length: int = 500) -> str:
+    # to samo co content:excerpt(length, true) w PocketBase: tekst bez tagów, ucięty z "..."
+    text = " ".join(unescape(_TAG_RE.sub(" ", html_content or "")).split())
+    if len(text) > length:
+        text = text[:length].rstrip() + "..."
+    return text
+
+
+# --------- SEARCH INDEX (BM25 w pamięci) ---------
+# Zamiast title~q || content~q (LIKE po całym HTML) trzymamy indeks odwrócony
+# opublikowanych postów. Tokeny: HTML bez tagów + normalizacja jak w slugify (bez PL znaków).
+
+# NFKD nie rozkłada "ł", a slugify by je wyciął ("żółć" -> "zoc")
+_SEARCH_FOLD = str.maketrans({"ł": "l", "Ł": "L"})
+
+def _search_tokens(text: str) -> List[str]:
+    text = unescape(_TAG_RE.sub(" ", text or "")).translate(_SEARCH_FOLD)
+    return [t for t in slugify(text).split("-") if t]
+
+_SEARCH_FIELDS = "id,title,content,published,created,updated"
+SEARCH_INDEX_SYNC_INTERVAL = 60
+SEARCH_INDEX_REBUILD_INTERVAL = 60 * 30  # pełna przebudowa łapie usunięte posty
+
+_SEARCH_INDEX = SearchIndex(_search_tokens)
+_SEARCH_INDEX_READY = False
+_SEARCH_INDEX_HWM: str = ""  # największe `updated` w indeksie
+_SEARCH_INDEX_REBUILD_TS: float = 0.0
+
+def _search_index_put(index: SearchIndex, raw: Dict[str, Any]) -> None:
+    global _SEARCH_INDEX_HWM
+
+    pid = raw.get("id")
+    if not pid:
+        return
 
-    text = _TAG_RE.sub(" ", html_content)
-    text = unescape(text)
-    words = re.findall(r"\S+", text)
-    minutes = ceil(len(words) / max(wpm, 1))
-    return max(1, minutes)
+    # przy okazji: czas czytania dla list
+    if "content" in raw and _word_count_key(raw) not in _WORD_COUNT_CACHE:
+        _store_word_count(raw)
 
+    if raw.get("published"):
+        index.upsert(
+            pid,
+            raw.get("title") or "",
+            raw.get("content") or "",
+            meta={"created": raw.get("created") or ""},
+        )
+    else:
+        index.remove(pid)
+
+    updated = raw.get("updated") or ""
+    if updated > _SEARCH_INDEX_HWM:
+        _SEARCH_INDEX_HWM = updated
+
+def search_index_upsert(raw: Dict[str, Any]) -> None:
+    # wołane, gdy dostaliśmy świeży, pełny rekord posta (np. po edycji)
+    if _SEARCH_INDEX_READY and "content" in raw and "published" in raw:
+        _search_index_put(_SEARCH_INDEX, raw)
+
+def _build_search_index(
+    items: List[Dict[str, Any]],
+    count_words: set,
+) -> Tuple[SearchIndex, str, Dict[Tuple[str, str], int]]:
+    # czyste obliczenie (bez globali) - tokenizacja całego bloga, idzie w wątku;
+    # liczby słów tylko dla count_words, do cache wpisuje je wywołujący (na pętli)
+    index = SearchIndex(_search_tokens)
+    hwm = ""
+    words: Dict[Tuple[str, str], int] = {}
+    for it in items:
+        if not it.get("id"):
+            continue
+        key = _word_count_key(it)
+        if key in count_words:
+            words[key] = html_word_count(it.get("content") or "")
+        if it.get("published"):
+            index.upsert(it["id"], it.get("title") or "", it.get("content") or "", meta={"created": it.get("created") or ""})
+        hwm = max(hwm, it.get("updated") or "")
+    return index, hwm, words
+
+async def sync_search_index() -> None:
+    global _SEARCH_INDEX, _SEARCH_INDEX_READY, _SEARCH_INDEX_HWM, _SEARCH_INDEX_REBUILD_TS
+
+    if not _SEARCH_INDEX_READY or (time.time() - _SEARCH_INDEX_REBUILD_TS) >= SEARCH_INDEX_REBUILD_INTERVAL:
+        items = await _scan_records(POSTS_COLLECTION, "published=true", _SEARCH_FIELDS, "updated", per_page=100)
+
+        # budujemy obok (w wątku - pętla obsługuje w tym czasie requesty) i podmieniamy,
+        # wyszukiwarka cały czas widzi spójny indeks
+        count_words = {
+            key for key in map(_word_count_key, items)
+            if key is not None and key not in _WORD_COUNT_CACHE
+        }
+        fresh, hwm, words = await asyncio.to_thread(_build_search_index, items, count_words)
+        for key, n in words.items():
+            _WORD_COUNT_CACHE.set(key, n)
+
+        _SEARCH_INDEX = fresh
+        _SEARCH_INDEX_HWM = hwm
+        _SEARCH_INDEX_READY = True
+        _SEARCH_INDEX_REBUILD_TS = time.time()
+        return
+
+    # delta: także nieopublikowane, żeby zdjęte posty wypadły z indeksu
+    hwm = pb_escape(_SEARCH_INDEX_HWM)
+    items = await _scan_records(POSTS_COLLECTION, f'updated>="{hwm}"', _SEARCH_FIELDS, "updated", per_page=100)
+    for it in items:
+        _search_index_put(_SEARCH_INDEX, it)
+
+async def get_posts_by_ids(ids: List[str], fields: str | None = None) -> List[Dict[str, Any]]:
+    """
+    Opublikowane posty o podanych id, w kolejności `ids` (jedno zapytanie na paczkę).
+    """
+    if not ids:
+        return []
+
+    found: Dict[str, Dict[str, Any]] = {}
+    for i in range(0, len(ids), 50):
+        chunk = ids[i:i + 50]
+        or_part = " || ".join(f'id="{pb_escape(pid)}"' for pid in chunk)
+        params: Dict[str, Any] = {
+            "page": 1,
+            "perPage": len(chunk),
+            "filter": f"(published=true) && ({or_part})",
+        }
+        if fields:
+            params["fields"] = fields
+        data = await pb_get(f"/api/collections/{POSTS_COLLECTION}/records", params=params)
+        for it in data.get("items") or []:
+            found[it.get("id")] = it
+
+    return [found[pid] for pid in ids if pid in found]
+
+async def _search_posts_local(query: str, page: int, per_page: int) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    index = _SEARCH_INDEX
+    with span("search"):
+        ranked = index.search(query, sort_key=lambda pid: (index.meta.get(pid) or {}).get("created") or "")
+
+    start = (page - 1) * per_page
+    ids = [pid for pid, _ in ranked[start:start + per_page]]
+
+    items = await get_posts_by_ids(ids, fields=_POST_LIST_FIELDS)
+    await prepare_list_items(items)
+    posts = [normalize_post(it) for it in items]
+
+    pagination = {
+        "page": page,
+        "per_page": per_page,
+        "total_pages": max(1, ceil(len(ranked) / per_page)),
+        "total_items": len(ranked),
+    }
+    return posts, pagination
 
 async def search_posts(query: str, page: int, per_page: int) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    if _SEARCH_INDEX_READY:
+        return await _search_posts_local(query, page, per_page)
+
+    # indeks jeszcze się nie zbudował -> stara ścieżka przez PocketBase
     q = pb_escape(query)
     flt = f'(published=true) && ((title~"{q}") || (content~"{q}"))'
 
@@ -474,13 +898,13 @@ async def search_posts(query: str, page: int, per_page: int) -> Tuple[List[Dict[
             "perPage": per_page,
             "sort": "-created",
             "filter": flt,
+            "fields": _POST_LIST_FIELDS,
         },
     )
 
     items = data.get("items") or []
 
-    for it in items:
-        await attach_series_data(it)
+    await prepare_list_items(items)
 
     posts = [normalize_post(it) for it in items]
 
@@ -493,22 +917,36 @@ async def search_posts(query: str, page: int, per_page: int) -> Tuple[List[Dict[
     return posts, pagination
 
 
-async def pb_get(path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-    url = PB_URL.rstrip("/") + path
+async def pb_request_auth(method: str, path: str, **kwargs: Any) -> httpx.Response:
+    """
+    Request z tokenem serwisowym. Na 401 (token unieważniony / wygasł wcześniej)
+    logujemy się od nowa i ponawiamy raz - 401 oznacza, że PocketBase nic nie zapisał.
+    """
     token = await get_service_token()
-    headers = {"Authorization": f"Bearer {token}"}
-    client = await get_http_client()
-    r = await client.get(url, params=params or {}, headers=headers)
+    r = await _PB.request(method, path, headers={"Authorization": f"Bearer {token}"}, **kwargs)
+    if r.status_code == 401:
+        _SERVICE_TOKENS.invalidate(token)
+        token = await get_service_token()
+        r = await _PB.request(method, path, headers={"Authorization": f"Bearer {token}"}, **kwargs)
+
     r.raise_for_status()
+    return r
+
+def _pb_get_key(path: str, params: Optional[Dict[str, Any]]) -> Tuple[str, Tuple[Tuple[str, str], ...]]:
+    return path, tuple(sorted((str(k), str(v)) for k, v in (params or {}).items()))
+
+@timed("pb")
+async def pb_get(path: str, params: Optional[Dict[str, Any]] = None, timeout: Any = None) -> Dict[str, Any]:
+    # współdzielimy odpowiedź, nie słownik: każdy wywołujący dostaje własne .json()
+    r = await _PB_GET_COALESCER.run(
+        _pb_get_key(path, params),
+        lambda: pb_request_auth("GET", path, params=params or {}, timeout=timeout),
+    )
     return r.json()
 
-async def pb_patch(path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
-    url = PB_URL.rstrip("/") + path
-    token = await get_service_token()
-    headers = {"Authorization": f"Bearer {token}"}
-    client = await get_http_client()
-    r = await client.patch(url, json=payload, headers=headers)
-    r.raise_for_status()
+@timed("pb")
+async def pb_patch(path: str, payload: Dict[str, Any], timeout: Any = None) -> Dict[str, Any]:
+    r = await pb_request_auth("PATCH", path, json=payload, timeout=timeout)
     return r.json()
 
 
@@ -533,9 +971,10 @@ def normalize_post(raw: Dict[str, Any]) -> Dict[str, Any]:
                 content += "\n"
             content += "\n<hr>\n" + description
 
-    excerpt = (content or "").strip()
-    if len(excerpt) > 240:
-        excerpt = excerpt[:240].rstrip() + "…"
+    # rekordy z list mają gotową zajawkę z PocketBase (patrz _POST_LIST_FIELDS)
+    excerpt = raw.get("_excerpt")
+    if excerpt is None:
+        excerpt = html_excerpt(raw.get("content") or "", POST_EXCERPT_LENGTH)
 
     created_raw = raw.get("created")
     updated_raw = raw.get("updated")
@@ -558,28 +997,64 @@ def normalize_post(raw: Dict[str, Any]) -> Dict[str, Any]:
         "updated_raw": updated_raw,
         "created": format_pl_date(created_raw),
         "updated": format_pl_date(updated_raw),
-        "reading_time": calc_reading_time_minutes(content),
+        "reading_time": _reading_time_for(raw),
         "series": series_obj,
         "sources": raw.get("sources") or [],
         "tags": raw.get("tags") or [],
     }
 
 
-async def get_all_posts(page: int, per_page: int) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
-    data = await pb_get(
-        f"/api/collections/{POSTS_COLLECTION}/records",
-        params={
-            "page": page,
-            "perPage": per_page,
-            "sort": "-created",
-            "filter": "published=true",
-        },
-    )
+# --------- LISTY POSTÓW (projekcja pól) ---------
+# Listy nie renderują treści: zamiast całego HTML bierzemy tekstową zajawkę liczoną
+# przez PocketBase, a czas czytania z _WORD_COUNT_CACHE.
 
-    items = data.get("items") or []
+POST_EXCERPT_LENGTH = 500
+_POST_LIST_FIELDS = (
+    "id,title,slug,meta_description,published,comments_on,category,creator,thumbnail,"
+    f"views,created,updated,series,tags,content:excerpt({POST_EXCERPT_LENGTH},true)"
+)
+# widgety w sidebarze: tytuł + licznik
+_POST_WIDGET_FIELDS = "id,title,slug,published,comments_on,category,views,created,updated,series"
 
+def _mark_list_items(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # przy _POST_LIST_FIELDS "content" to już zajawka -> przenosimy, żeby nikt nie
+    # wziął jej za treść (indeks wyszukiwarki, liczenie słów)
+    for it in items:
+        if "_excerpt" not in it:
+            it["_excerpt"] = it.pop("content", None) or ""
+    return items
+
+async def _ensure_word_counts(items: List[Dict[str, Any]]) -> None:
+    # brakujące liczby słów (np. tuż po starcie) -> jedno zapytanie o treść tych postów
+    missing = [it["id"] for it in items if it.get("id") and _post_word_count(it) is None]
+    if not missing:
+        return
+    try:
+        full = await get_posts_by_ids(missing, fields="id,updated,content")
+    except httpx.HTTPError as e:
+        print("[LIST] word counts unavailable", repr(e))
+        return
+    words = {it["id"]: _store_word_count(it) for it in full if it.get("id")}
     for it in items:
-        await attach_series_data(it)
+        if it.get("id") in words:
+            it["_words"] = words[it["id"]]
+
+async def prepare_list_items(items: List[Dict[str, Any]]) -> None:
+    """
+    Rekordy pobrane z _POST_LIST_FIELDS -> gotowe do normalize_post
+    (zajawka, serie, czas czytania).
+    """
+    _mark_list_items(items)
+    await asyncio.gather(attach_series_data_many(items), _ensure_word_counts(items))
+
+async def get_all_posts(
+    page: int,
+    per_page: int,
+    after: Tuple[str, str] | None = None,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    items, pagination = await fetch_post_list("published=true", "all", lambda p: True, page, per_page, after)
+
+    await prepare_list_items(items)
 
     comment_counts = await get_comment_counts()
 
@@ -589,12 +1064,6 @@ async def get_all_posts(page: int, per_page: int) -> Tuple[List[Dict[str, Any]],
         post["comments"] = comment_counts.get(post["id"], 0)
         posts.append(post)
 
-    pagination = {
-        "page": int(data.get("page") or page),
-        "per_page": int(data.get("perPage") or per_page),
-        "total_pages": int(data.get("totalPages") or 1),
-        "total_items": int(data.get("totalItems") or len(posts)),
-    }
     return posts, pagination
 
 
@@ -606,221 +1075,797 @@ async def get_popular_tags(limit: int = 10) -> list[str]:
     """
     Zlicza tagi z opublikowanych postów i zwraca top N (najczęściej używanych).
     """
-    # pobierz wiele rekordów (maks. 2000)
-    data = await pb_get(
-        f"/api/collections/{POSTS_COLLECTION}/records",
-        params={
-            "page": 1,
-            "perPage": 2000,
-            "filter": "published=true",
-            "fields": "tags",
-        },
-    )
-
-    items = data.get("items") or []
-    all_tags = []
-    for it in items:
-        tags = it.get("tags") or []
-        if isinstance(tags, list):
-            all_tags.extend(tags)
-        elif isinstance(tags, str):
-            # w razie stringa zamiast listy
-            parts = [t.strip() for t in tags.split(",") if t.strip()]
-            all_tags.extend(parts)
-
-    counts = Counter(all_tags)
-    most = counts.most_common(limit)
-    return [tag for tag, _ in most]
-
-_SERIES_CACHE: Dict[str, Optional[Dict[str, Any]]] = {}
+    # indeks tagów z katalogu już ma te liczby
+    await ensure_post_catalog()
+    counts = Counter({tag: len(ids) for tag, ids in _TAG_INDEX.items()})
+    return [tag for tag, _ in counts.most_common(limit)]
+
+# id serii -> rekord (None = nie udało się pobrać / brak; trzymamy krótko)
+_SERIES_CACHE = TTLCache(maxsize=500, ttl=60 * 30, negative_ttl=60)
+# slug serii -> {id, name, slug}
+_SERIES_SLUG_CACHE = TTLCache(maxsize=500, ttl=60 * 30, negative_ttl=60)
+
+def invalidate_series(series_id: str | None = None) -> None:
+    # bez argumentu czyści wszystko (np. po zmianie serii w panelu PB)
+    if series_id is None:
+        _SERIES_CACHE.clear()
+        _SERIES_SLUG_CACHE.clear()
+        return
+    _SERIES_CACHE.invalidate(series_id)
+    _SERIES_SLUG_CACHE.invalidate_where(lambda _, v: isinstance(v, dict) and v.get("id") == series_id)
 
 async def get_series_by_slug(slug: str) -> Optional[Dict[str, Any]]:
-    slug = pb_escape(slug)
+    cached = _SERIES_SLUG_CACHE.get(slug)
+    if cached is not MISSING:
+        return cached
+
     data = await pb_get(
         f"/api/collections/{SERIES_COLLECTION}/records",
         params={
             "page": 1,
             "perPage": 1,
-            "filter": f'slug="{slug}"',
+            "filter": f'slug="{pb_escape(slug)}"',
             "fields": "id,name,slug",
         },
     )
     items = data.get("items") or []
-    return items[0] if items else None
+    return _SERIES_SLUG_CACHE.set(slug, items[0] if items else None)
 
 
 async def get_series_by_id(series_id: str) -> Optional[Dict[str, Any]]:
     if not series_id:
         return None
 
-    if series_id in _SERIES_CACHE:
-        return _SERIES_CACHE[series_id]
+    cached = _SERIES_CACHE.get(series_id)
+    if cached is not MISSING:
+        return cached
 
     try:
         data = await pb_get(f"/api/collections/{SERIES_COLLECTION}/records/{series_id}")
     except Exception:
         data = None
 
-    _SERIES_CACHE[series_id] = data
-    return data
+    return _SERIES_CACHE.set(series_id, data)
 
 
 async def attach_series_data(raw_post: Dict[str, Any]) -> None:
-    sid = raw_post.get("series")
-    if not sid:
-        raw_post["_series"] = None
+    await attach_series_data_many([raw_post])
+
+# ile id serii w jednym zapytaniu (filtr leci w URL-u)
+_SERIES_BATCH_SIZE = 50
+
+async def _fetch_series_batch(series_ids: List[str]) -> None:
+    for i in range(0, len(series_ids), _SERIES_BATCH_SIZE):
+        chunk = series_ids[i:i + _SERIES_BATCH_SIZE]
+        or_part = " || ".join(f'id="{pb_escape(sid)}"' for sid in chunk)
+        try:
+            data = await pb_get(
+                f"/api/collections/{SERIES_COLLECTION}/records",
+                params={"page": 1, "perPage": len(chunk), "filter": or_part},
+            )
+            found = {it.get("id"): it for it in (data.get("items") or [])}
+        except Exception:
+            found = {}
+
+        for sid in chunk:
+            _SERIES_CACHE.set(sid, found.get(sid))
+
+async def attach_series_data_many(raw_posts: List[Dict[str, Any]]) -> None:
+    """
+    Uzupełnia raw_post["_series"] dla całej strony postów naraz:
+    - rekordy z expand=series trafiają prosto do cache
+    - brakujące serie pobieramy jednym zapytaniem (id="a" || id="b" ...)
+    """
+    missing: List[str] = []
+    for it in raw_posts:
+        it["_series"] = None
+        sid = str(it.get("series") or "")
+        if not sid:
+            continue
+        expanded = (it.get("expand") or {}).get("series")
+        if isinstance(expanded, dict) and expanded.get("id") == sid:
+            it["_series"] = _SERIES_CACHE.set(sid, expanded)
+            continue
+        # jeden liczony odczyt na post (statystyki w /_admin/caches)
+        cached = _SERIES_CACHE.get(sid)
+        if cached is MISSING:
+            if sid not in missing:
+                missing.append(sid)
+        else:
+            it["_series"] = cached
+
+    if not missing:
         return
+    await _fetch_series_batch(missing)
 
-    raw_post["_series"] = await get_series_by_id(str(sid))
+    for it in raw_posts:
+        sid = str(it.get("series") or "")
+        if sid in missing:
+            # None także wtedy, gdy wpis zdążył wygasnąć między pobraniem a tą pętlą
+            it["_series"] = _SERIES_CACHE.peek(sid, None)
 
 _PUBLIC_CACHE: dict[str, tuple[float, Any]] = {}
-
-def _cache_get(key: str, ttl: int) -> Any | None:
-    now = time.time()
-    hit = _PUBLIC_CACHE.get(key)
-    if not hit:
-        return None
-    ts, val = hit
-    if (now - ts) < ttl:
-        return val
-    return None
+_PUBLIC_CACHE_STATS = CacheStats()
 
 def _cache_set(key: str, val: Any) -> Any:
     _PUBLIC_CACHE[key] = (time.time(), val)
     return val
 
-def _cache_invalidate(prefix: str) -> None:
+def _cache_invalidate(prefix: str) -> int:
     # usuwa wszystkie klucze zaczynające się od prefix
-    for k in list(_PUBLIC_CACHE.keys()):
-        if k.startswith(prefix):
-            _PUBLIC_CACHE.pop(k, None)
+    keys = [k for k in _PUBLIC_CACHE if k.startswith(prefix)]
+    for k in keys:
+        _PUBLIC_CACHE.pop(k, None)
+    return len(keys)
+
+# klucz -> lock; tylko jedna korutyna przebudowuje dany wpis (single-flight)
+_PUBLIC_CACHE_LOCKS: dict[str, asyncio.Lock] = {}
+# referencje do zadań odświeżających w tle (żeby GC ich nie zebrał w trakcie)
+_PUBLIC_CACHE_REFRESH_TASKS: set[asyncio.Task] = set()
+
+# stale-while-revalidate: ile sekund po wygaśnięciu TTL wolno jeszcze podać starą wartość
+PUBLIC_CACHE_MAX_STALE = 60 * 10
+# stale-on-error: ile sekund po wygaśnięciu TTL stara wartość ratuje nas przy błędzie PocketBase
+PUBLIC_CACHE_STALE_IF_ERROR = 60 * 60 * 24
+
+async def _cache_load_locked(
+    key: str,
+    ttl: int,
+    loader: Callable[[], Awaitable[Any]],
+    stale_if_error: int,
+) -> Any:
+    # wołać tylko z trzymanym _PUBLIC_CACHE_LOCKS[key]; miss policzył już _cache_get_or_load
+    hit = _PUBLIC_CACHE.get(key)
+    if hit is not None and (time.time() - hit[0]) < ttl:
+        return hit[1]
 
+    try:
+        return _cache_set(key, await loader())
+    except Exception as e:
+        hit = _PUBLIC_CACHE.get(key)
+        if hit is not None and (time.time() - hit[0]) < ttl + stale_if_error:
+            print(f"[CACHE] {key}: serving stale value after error", repr(e))
+            return hit[1]
+        raise
+
+def _cache_refresh_in_background(
+    key: str,
+    ttl: int,
+    loader: Callable[[], Awaitable[Any]],
+    stale_if_error: int,
+) -> None:
+    lock = _PUBLIC_CACHE_LOCKS.setdefault(key, asyncio.Lock())
+    if lock.locked():
+        return  # już ktoś odświeża
+
+    async def _run() -> None:
+        async with lock:
+            try:
+                await _cache_load_locked(key, ttl, loader, stale_if_error)
+            except Exception as e:
+                print(f"[CACHE] {key}: background refresh failed", repr(e))
+
+    task = asyncio.create_task(_run())
+    _PUBLIC_CACHE_REFRESH_TASKS.add(task)
+    task.add_done_callback(_PUBLIC_CACHE_REFRESH_TASKS.discard)
+
+async def _cache_get_or_load(
+    key: str,
+    ttl: int,
+    loader: Callable[[], Awaitable[Any]],
+    *,
+    max_stale: int = 0,
+    stale_if_error: int = 0,
+) -> Any:
+    """
+    - świeży wpis -> zwraca od razu
+    - max_stale > 0: wpis przeterminowany o mniej niż max_stale -> zwraca starą wartość
+      i odświeża w tle (stale-while-revalidate)
+    - stale_if_error > 0: gdy loader rzuci wyjątek, a stara wartość nie jest starsza
+      niż ttl + stale_if_error -> zwraca starą wartość zamiast błędu
+    """
+    hit = _PUBLIC_CACHE.get(key)
+    if hit is not None:
+        age = time.time() - hit[0]
+        if age < ttl:
+            _PUBLIC_CACHE_STATS.hits += 1
+            return hit[1]
+        if age < ttl + max_stale:
+            _PUBLIC_CACHE_STATS.stale_hits += 1
+            _cache_refresh_in_background(key, ttl, loader, stale_if_error)
+            return hit[1]
+
+    lock = _PUBLIC_CACHE_LOCKS.setdefault(key, asyncio.Lock())
+
+    # ktoś już odświeża ten klucz -> jeśli mamy starą wartość, oddajemy ją od razu
+    if lock.locked() and hit is not None:
+        _PUBLIC_CACHE_STATS.stale_hits += 1
+        return hit[1]
+
+    _PUBLIC_CACHE_STATS.misses += 1
+
+    async with lock:
+        return await _cache_load_locked(key, ttl, loader, stale_if_error)
+
+_PUBLIC_WIDGET_DEFAULTS: Dict[str, Any] = {
+    "categories": [],
+    "series_list": [],
+    "top_posts": [],
+    "top_commented": [],
+    "post_count": 0,
+    "popular_tags": [],
+}
+
+# widget -> (klucz w _PUBLIC_CACHE, TTL w sekundach, loader)
+# lambdy, bo loadery są zdefiniowane niżej w pliku
+_PUBLIC_WIDGETS: Dict[str, Tuple[str, int, Callable[[], Awaitable[Any]]]] = {
+    "categories": ("public:categories", 60 * 30, lambda: get_categories()),
+    "series_list": ("public:series_list", 60 * 30, lambda: get_series_list()),
+    "top_posts": ("public:top_posts", 60 * 2, lambda: get_top_posts(limit=3)),
+    "top_commented": ("public:top_commented", 60 * 2, lambda: get_top_commented(limit=3)),
+    "post_count": ("public:post_count", 60 * 5, lambda: get_post_count()),
+    "popular_tags": ("public:popular_tags", 60 * 10, lambda: get_popular_tags(limit=10)),
+}
+# liczone z katalogu postów (rebuild_post_catalog odświeża je od razu)
+_CATALOG_WIDGETS = ("categories", "post_count", "popular_tags")
+
+@timed("widgets")
 async def get_public_widgets_cached() -> Dict[str, Any]:
-    TTL_CATEGORIES = 60 * 30
-    TTL_SERIES = 60 * 30
-    TTL_TOP_POSTS = 60 * 2
-    TTL_TOP_COMMENTED = 60 * 2
-    TTL_POST_COUNT = 60 * 5
-    TTL_POPULAR_TAGS = 60 * 10
+    # braki pobieramy równolegle, a nie jeden po drugim
+    results = await asyncio.gather(
+        *(
+            _cache_get_or_load(
+                key,
+                ttl,
+                loader,
+                max_stale=PUBLIC_CACHE_MAX_STALE,
+                stale_if_error=PUBLIC_CACHE_STALE_IF_ERROR,
+            )
+            for key, ttl, loader in _PUBLIC_WIDGETS.values()
+        ),
+        return_exceptions=True,
+    )
 
-    categories = _cache_get("public:categories", TTL_CATEGORIES)
-    if categories is None:
-        categories = _cache_set("public:categories", await get_categories())
+    # błąd jednego widgetu (bez starej wartości w cache) nie zeruje pozostałych
+    widgets: Dict[str, Any] = {}
+    for name, res in zip(_PUBLIC_WIDGETS, results):
+        if isinstance(res, BaseException):
+            print(f"[WIDGETS ERROR] {name}", repr(res))
+            res = _PUBLIC_WIDGET_DEFAULTS[name]
+        widgets[name] = res
+    return widgets
+
+async def _cache_refresh_now(key: str, loader: Callable[[], Awaitable[Any]]) -> None:
+    # wymusza przeładowanie wpisu (niezależnie od TTL); przy błędzie zostaje stara wartość
+    lock = _PUBLIC_CACHE_LOCKS.setdefault(key, asyncio.Lock())
+    async with lock:
+        _cache_set(key, await loader())
+
+# --------- BACKGROUND REFRESH (warm-up + scheduler) ---------
+
+# odświeżamy przed wygaśnięciem: interwał = TTL * ten współczynnik
+_REFRESH_AHEAD_FACTOR = 0.8
+
+_SCHEDULER_TASK: asyncio.Task | None = None
+_SCHEDULER_JOB_TASKS: Dict[str, asyncio.Task] = {}  # nazwa zadania -> ostatnie uruchomienie
+
+_PRERENDER_INTERVAL = 60 * 60
+
+def _scheduled_jobs() -> List[Tuple[str, float, Callable[[], Awaitable[Any]], bool]]:
+    # (nazwa, interwał w sekundach, zadanie, czy odpalić od razu po starcie)
+    # widgety i liczniki są już wypełnione przez warm_up_caches -> czekają pełny interwał
+    jobs: List[Tuple[str, float, Callable[[], Awaitable[Any]], bool]] = [
+        (
+            "comment_counts",
+            _COMMENT_COUNT_CACHE_TTL * _REFRESH_AHEAD_FACTOR,
+            lambda: get_comment_counts(force=True),
+            False,
+        ),
+        ("prerender_posts", _PRERENDER_INTERVAL, prerender_published_posts, True),
+        ("post_catalog", POST_CATALOG_INTERVAL, rebuild_post_catalog, False),
+        ("flush_views", VIEW_FLUSH_INTERVAL, flush_post_views, False),
+        ("search_index", SEARCH_INDEX_SYNC_INTERVAL, sync_search_index, True),
+        ("service_token", SERVICE_TOKEN_CHECK_INTERVAL, _SERVICE_TOKENS.refresh_if_due, False),
+        ("pb_stats", PB_STATS_LOG_INTERVAL, log_pb_stats, False),
+    ]
+    for name, (key, ttl, loader) in _PUBLIC_WIDGETS.items():
+        jobs.append(
+            (
+                f"widget:{name}",
+                ttl * _REFRESH_AHEAD_FACTOR,
+                lambda key=key, loader=loader: _cache_refresh_now(key, loader),
+                False,
+            )
+        )
+    return jobs
 
-    series_list = _cache_get("public:series_list", TTL_SERIES)
-    if series_list is None:
-        series_list = _cache_set("public:series_list", await get_series_list())
+async def warm_up_caches() -> None:
+    """
+    Wypełnia cache przed pierwszym requestem workera.
+    Błędy tylko logujemy - niedostępny PocketBase nie może blokować startu.
+    """
+    started = time.perf_counter()
 
-    top_posts = _cache_get("public:top_posts", TTL_TOP_POSTS)
-    if top_posts is None:
-        top_posts = _cache_set("public:top_posts", await get_top_posts(limit=3))
+    # najpierw liczniki komentarzy (korzysta z nich top_commented)
+    # i katalog postów (z niego są kategorie, tagi i liczba postów)
+    try:
+        await get_comment_counts(force=True)
+    except Exception as e:
+        print("[WARMUP] comment_counts failed", repr(e))
+    try:
+        await rebuild_post_catalog()
+    except Exception as e:
+        print("[WARMUP] post_catalog failed", repr(e))
 
-    top_commented = _cache_get("public:top_commented", TTL_TOP_COMMENTED)
-    if top_commented is None:
-        top_commented = _cache_set("public:top_commented", await get_top_commented(limit=3))
+    results = await asyncio.gather(
+        *(_cache_refresh_now(key, loader) for key, _, loader in _PUBLIC_WIDGETS.values()),
+        return_exceptions=True,
+    )
+    for name, res in zip(_PUBLIC_WIDGETS, results):
+        if isinstance(res, BaseException):
+            print(f"[WARMUP] widget:{name} failed", repr(res))
 
-    post_count = _cache_get("public:post_count", TTL_POST_COUNT)
-    if post_count is None:
-        post_count = _cache_set("public:post_count", await get_post_count())
+    print(f"[WARMUP] done in {(time.perf_counter() - started) * 1000:.0f} ms")
 
-    popular_tags = _cache_get("public:popular_tags", TTL_POPULAR_TAGS)
-    if popular_tags is None:
-        popular_tags = _cache_set("public:popular_tags", await get_popular_tags(limit=10))
+async def _run_scheduler() -> None:
+    jobs = _scheduled_jobs()
+    now = time.monotonic()
+    next_run = {name: now if at_start else now + interval for name, interval, _, at_start in jobs}
 
-    return {
-        "categories": categories,
-        "series_list": series_list,
-        "top_posts": top_posts,
-        "top_commented": top_commented,
-        "post_count": post_count,
-        "popular_tags": popular_tags,
-    }
+    async def _run_job(name: str, job: Callable[[], Awaitable[Any]]) -> None:
+        try:
+            await job()
+        except Exception as e:
+            print(f"[SCHEDULER] {name} failed", repr(e))
+
+    while True:
+        now = time.monotonic()
+        for name, interval, job, _ in jobs:
+            if now < next_run[name]:
+                continue
+            next_run[name] = now + interval
+            # każde zadanie osobno - wolne (np. pełny skan) nie wstrzymuje flush_views
+            running = _SCHEDULER_JOB_TASKS.get(name)
+            if running is not None and not running.done():
+                print(f"[SCHEDULER] {name} still running, skipping this run")
+                continue
+            _SCHEDULER_JOB_TASKS[name] = asyncio.create_task(_run_job(name, job))
+
+        await asyncio.sleep(max(0.5, min(next_run.values()) - time.monotonic()))
+
+def start_scheduler() -> None:
+    global _SCHEDULER_TASK
+    if _SCHEDULER_TASK is None:
+        _SCHEDULER_TASK = asyncio.create_task(_run_scheduler())
+
+async def stop_scheduler() -> None:
+    global _SCHEDULER_TASK
+    tasks = list(_PUBLIC_CACHE_REFRESH_TASKS) + list(_SCHEDULER_JOB_TASKS.values())
+    _SCHEDULER_JOB_TASKS.clear()
+    if _SCHEDULER_TASK is not None:
+        tasks.append(_SCHEDULER_TASK)
+        _SCHEDULER_TASK = None
+
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+# --------- COMMENT COUNTS (przyrostowy indeks) ---------
+# Indeks jest zasiewany jednym pełnym skanem, potem doczytujemy tylko komentarze
+# z `updated` >= high-water mark. Pełny skan co jakiś czas robi rekoncyliację
+# (łapie usunięte rekordy, których delta nie widzi).
+
+_COMMENT_INDEX: Dict[str, str] = {}  # comment_id -> post_id (tylko zatwierdzone)
+_COMMENT_COUNTS: Dict[str, int] = {}  # post_id -> liczba zatwierdzonych komentarzy
+_COMMENT_INDEX_HWM: str = ""  # największe `updated` jakie widzieliśmy
+_COMMENT_INDEX_SYNC_TS: float = 0.0
+_COMMENT_INDEX_RECONCILE_TS: float = 0.0
+_COMMENT_INDEX_LOCK = asyncio.Lock()
+
+_COMMENT_COUNT_CACHE_TTL = 60  # sekundy; co tyle doczytujemy deltę
+_COMMENT_INDEX_RECONCILE_INTERVAL = 60 * 30
+
+def _comment_index_apply(raw: Dict[str, Any], advance_hwm: bool = True) -> None:
+    """
+    advance_hwm=False: rekord zapisany lokalnie (nie z delty). Nie przesuwamy HWM, bo
+    komentarze dodane / zatwierdzone gdzie indziej od ostatniej synchronizacji
+    (inne workery, panel PB) mają mniejsze `updated` i delta by je pominęła.
+    Kolejna delta i tak dostanie ten rekord - apply jest idempotentne.
+    """
+    global _COMMENT_INDEX_HWM
+
+    cid = raw.get("id")
+    post_id = raw.get("post")
+    if not cid:
+        return
+
+    prev = _COMMENT_INDEX.pop(cid, None)
+    if prev:
+        _COMMENT_COUNTS[prev] -= 1
+        if _COMMENT_COUNTS[prev] <= 0:
+            _COMMENT_COUNTS.pop(prev, None)
+
+    if post_id and raw.get("approved", False):
+        _COMMENT_INDEX[cid] = post_id
+        _COMMENT_COUNTS[post_id] = _COMMENT_COUNTS.get(post_id, 0) + 1
+
+    updated = raw.get("updated") or ""
+    if advance_hwm and updated > _COMMENT_INDEX_HWM:
+        _COMMENT_INDEX_HWM = updated
+
+async def _scan_comments(flt: str, fields: str) -> List[Dict[str, Any]]:
+    return await _scan_records(COMMENTS_COLLECTION, flt, fields, "updated")
+
+async def _comment_index_reconcile() -> None:
+    global _COMMENT_INDEX_HWM, _COMMENT_INDEX_RECONCILE_TS
+
+    items = await _scan_comments("approved=true", "id,post,approved,updated")
 
-_COMMENT_COUNT_CACHE: Optional[Dict[str, int]] = None
-_COMMENT_COUNT_CACHE_TS: float = 0.0
-_COMMENT_COUNT_CACHE_TTL = 60  # sekundy
+    _COMMENT_INDEX.clear()
+    _COMMENT_COUNTS.clear()
+    _COMMENT_INDEX_HWM = ""
+    for c in items:
+        _comment_index_apply(c)
 
-async def get_comment_counts() -> Dict[str, int]:
-    global _COMMENT_COUNT_CACHE, _COMMENT_COUNT_CACHE_TS
+    _COMMENT_INDEX_RECONCILE_TS = time.time()
+
+async def _comment_index_sync_delta() -> None:
+    # >= a nie >, bo kilka rekordów może mieć ten sam `updated`; apply jest idempotentne
+    hwm = pb_escape(_COMMENT_INDEX_HWM)
+    items = await _scan_comments(f'updated>="{hwm}"', "id,post,approved,updated")
+    for c in items:
+        _comment_index_apply(c)
+
+@timed("comment_counts")
+async def get_comment_counts(force: bool = False) -> Dict[str, int]:
+    global _COMMENT_INDEX_SYNC_TS
 
     now = time.time()
-    if _COMMENT_COUNT_CACHE is not None and (now - _COMMENT_COUNT_CACHE_TS) < _COMMENT_COUNT_CACHE_TTL:
-        return _COMMENT_COUNT_CACHE
+    if not force and _COMMENT_INDEX_SYNC_TS and (now - _COMMENT_INDEX_SYNC_TS) < _COMMENT_COUNT_CACHE_TTL:
+        return _COMMENT_COUNTS
 
-    counts: Dict[str, int] = {}
-    page = 1
-    per_page = 200
+    async with _COMMENT_INDEX_LOCK:
+        # inna korutyna mogła zsynchronizować indeks, gdy czekaliśmy
+        if not force and _COMMENT_INDEX_SYNC_TS > now:
+            return _COMMENT_COUNTS
 
-    while True:
-        data = await pb_get(
-            f"/api/collections/{COMMENTS_COLLECTION}/records",
-            params={
-                "page": page,
-                "perPage": per_page,
-                "filter": "approved=true",
-                "fields": "post",
-            },
-        )
+        if not _COMMENT_INDEX_RECONCILE_TS or (time.time() - _COMMENT_INDEX_RECONCILE_TS) >= _COMMENT_INDEX_RECONCILE_INTERVAL:
+            await _comment_index_reconcile()
+        else:
+            await _comment_index_sync_delta()
 
-        items = data.get("items") or []
-        for c in items:
-            post_id = c.get("post")
-            if post_id:
-                counts[post_id] = counts.get(post_id, 0) + 1
+        _COMMENT_INDEX_SYNC_TS = time.time()
 
-        if page >= data.get("totalPages", 1):
-            break
-        page += 1
+    return _COMMENT_COUNTS
 
-    _COMMENT_COUNT_CACHE = counts
-    _COMMENT_COUNT_CACHE_TS = now
-    return counts
+# --------- PAGE CACHE (gotowy HTML dla anonimowych GET) ---------
+# Opt-in per route dekoratorem @page_cache(ttl=...). Klucz = host + ścieżka + znormalizowane query.
 
-def build_pagination_context(request: Request, pagination: Dict[str, Any]) -> Dict[str, Any]:
+_PAGE_CACHE: Dict[str, Tuple[float, bytes, str, Dict[str, Any]]] = {}  # klucz -> (ts, body, etag, meta)
+PAGE_CACHE_MAX_ENTRIES = 1000
+_PAGE_CACHE_STATS = CacheStats()
+
+# parametry z prefill/komunikatami -> strona "osobista", nie cache'ujemy
+_PAGE_CACHE_PERSONAL_PARAMS = {"ca", "ce", "cc", "cn", "cs", "cm", "error", "sent", "t"}
+_PAGE_CACHE_PERSONAL_COOKIES = {"comment_author", "comment_email"}
+# parametry śledzące nie zmieniają treści -> wycinamy z klucza
+_PAGE_CACHE_IGNORED_PARAMS = {"fbclid", "gclid"}
+
+def _page_cache_key(request: Request) -> str | None:
+    if request.method != "GET":
+        return None
+    if any(request.cookies.get(c) for c in _PAGE_CACHE_PERSONAL_COOKIES):
+        return None
+
+    params = []
+    for k, v in request.query_params.multi_items():
+        if k in _PAGE_CACHE_PERSONAL_PARAMS:
+            return None
+        if k in _PAGE_CACHE_IGNORED_PARAMS or k.startswith("utm_") or v == "":
+            continue
+        params.append((k, v))
+
+    params.sort()
+    return f"{request.url.netloc}{request.url.path}?{urlencode(params)}"
+
+def _page_cache_url_is_clean(request: Request) -> bool:
+    # strona renderuje request.url (canonical, og:url, udostępnianie, linki pagera) ->
+    # zapisujemy tylko odpowiedzi na URL bez parametrów wyciętych z klucza;
+    # z utm_* itd. wolno jedynie trafić w gotowy wpis
+    return not any(
+        k in _PAGE_CACHE_IGNORED_PARAMS or k.startswith("utm_") or v == ""
+        for k, v in request.query_params.multi_items()
+    )
+
+def _page_cache_set(key: str, body: bytes, meta: Dict[str, Any]) -> str:
+    etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+    _PAGE_CACHE.pop(key, None)
+    _PAGE_CACHE[key] = (time.time(), body, etag, meta)
+    # najstarsze wpisy wylatują pierwsze (dict trzyma kolejność wstawiania)
+    while len(_PAGE_CACHE) > PAGE_CACHE_MAX_ENTRIES:
+        _PAGE_CACHE.pop(next(iter(_PAGE_CACHE)), None)
+        _PAGE_CACHE_STATS.evictions += 1
+    return etag
+
+def _page_cache_invalidate(prefix: str = "") -> int:
+    keys = [k for k in _PAGE_CACHE if k.startswith(prefix)]
+    for k in keys:
+        _PAGE_CACHE.pop(k, None)
+    return len(keys)
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == "*" or tag == etag:
+            return True
+    return False
+
+def _page_cache_response(request: Request, body: bytes, etag: str) -> Response:
+    # no-cache = przeglądarka może trzymać kopię, ale zawsze pyta z If-None-Match
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return HTMLResponse(content=body, headers=headers)
+
+def page_cache(ttl: int, on_hit: Callable[[Request, Dict[str, Any]], Awaitable[None]] | None = None):
+    """
+    Cache gotowej odpowiedzi HTML dla GET bez danych osobistych.
+    - ETag (sha1 treści) + odpowiedź 304 na If-None-Match
+    - cache'ujemy tylko 200 bez Set-Cookie
+    - on_hit(request, meta): do efektów ubocznych, które muszą zajść także przy trafieniu
+      w cache (np. liczenie wyświetleń); meta endpoint zapisuje w request.state.page_cache_meta
+      przy renderowaniu i trzymamy ją razem z wpisem
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args: Any, **kwargs: Any):
+            request: Request = kwargs["request"]
+            key = _page_cache_key(request)
+            if key is None:
+                return await fn(*args, **kwargs)
+
+            with span("page_cache"):
+                hit = _PAGE_CACHE.get(key)
+            if hit is not None and (time.time() - hit[0]) < ttl:
+                _PAGE_CACHE_STATS.hits += 1
+                _, body, etag, meta = hit
+                if on_hit is not None:
+                    await on_hit(request, meta)
+                return _page_cache_response(request, body, etag)
+            _PAGE_CACHE_STATS.misses += 1
+
+            response = await fn(*args, **kwargs)
+
+            body = getattr(response, "body", None)
+            if (
+                not _page_cache_url_is_clean(request)
+                or response.status_code != 200
+                or not isinstance(body, bytes)
+                or "set-cookie" in response.headers
+            ):
+                return response
+
+            etag = _page_cache_set(key, body, getattr(request.state, "page_cache_meta", None) or {})
+            return _page_cache_response(request, body, etag)
+
+        return wrapper
+
+    return decorator
+
+PAGER_WINDOW = 2  # ile stron pokazujemy po obu stronach bieżącej
+
+def pager_window(page: int, total_pages: int, window: int = PAGER_WINDOW) -> List[int | None]:
+    """
+    Numery stron do pokazania: pierwsza, ostatnia i sąsiedztwo bieżącej;
+    None = przerwa ("…"). Długość nie zależy od liczby stron.
+    """
+    if total_pages <= 0:
+        return []
+    pages = {1, total_pages, *range(max(1, page - window), min(total_pages, page + window) + 1)}
+    out: List[int | None] = []
+    prev = 0
+    for p in sorted(pages):
+        if p - prev > 1:
+            out.append(None)
+        out.append(p)
+        prev = p
+    return out
+
+def _pagination_urls(request: Request, pagination: Dict[str, Any]) -> Tuple[Callable[[int], str], str | None, str | None]:
     page = int(pagination["page"])
     total_pages = int(pagination["total_pages"])
 
     def url_for(p: int) -> str:
-        return str(request.url.remove_query_params("page").include_query_params(page=p))
+        return str(request.url.remove_query_params(["page", "after"]).include_query_params(page=p))
 
     prev_url = url_for(page - 1) if page > 1 else None
-    next_url = url_for(page + 1) if page < total_pages else None
 
-    page_urls = {p: url_for(p) for p in range(1, total_pages + 1)}
+    # w trybie kursora idziemy dalej kursorem, w trybie stron - numerem strony
+    next_after = pagination.get("next_after")
+    if next_after and "after" in request.query_params:
+        next_url = str(request.url.remove_query_params(["page", "after"]).include_query_params(after=next_after))
+    elif page < total_pages:
+        next_url = url_for(page + 1)
+    elif next_after:
+        next_url = str(request.url.remove_query_params(["page", "after"]).include_query_params(after=next_after))
+    else:
+        next_url = None
+
+    return url_for, prev_url, next_url
+
+def build_pagination_context(request: Request, pagination: Dict[str, Any]) -> Dict[str, Any]:
+    page = int(pagination["page"])
+    total_pages = int(pagination["total_pages"])
+
+    url_for, prev_url, next_url = _pagination_urls(request, pagination)
+    page_window = pager_window(page, total_pages)
 
     return {
         "page": page,
         "total_pages": total_pages,
         "prev_url": prev_url,
         "next_url": next_url,
-        "page_urls": page_urls,
+        "page_window": page_window,
+        "page_urls": {p: url_for(p) for p in page_window if p is not None},
     }
 
 def build_pagination_html(request: Request, pagination: Dict[str, Any]) -> str:
     page = int(pagination["page"])
     total = int(pagination["total_pages"])
-    if total <= 1:
-        return ""
 
-    def url_for(p: int) -> str:
-        return str(request.url.remove_query_params("page").include_query_params(page=p))
+    url_for, prev_url, next_url = _pagination_urls(request, pagination)
+    if total <= 1 and not next_url:
+        return ""
 
     parts = ['<div class="pagination">']
 
-    if page > 1:
-        parts.append(f'<a href="{url_for(page-1)}">« Poprzednia</a>')
+    if prev_url:
+        parts.append(f'<a href="{prev_url}">« Poprzednia</a>')
+
+    for p in pager_window(page, total):
+        if p is None:
+            parts.append('<span class="pagination-gap">…</span>')
+        elif p == page:
+            parts.append(f"<strong>{p}</strong>")
+        else:
+            parts.append(f'<a href="{url_for(p)}">{p}</a>')
+
+    if next_url:
+        parts.append(f'<a href="{next_url}">Następna »</a>')
+
+    parts.append("</div>")
+    return "".join(parts)
+
+# --------- LISTY: stronicowanie po kluczu (created, id) ---------
+# Zamiast page/perPage (offset rośnie z głębokością strony) pytamy PocketBase o posty
+# "starsze niż kursor". Kursor to ?after=<created>,<id> albo - dla zwykłego ?page=N -
+# wpis tuż przed stroną, wzięty z katalogu postów. Liczby postów (total) też z katalogu,
+# więc PocketBase nie liczy ich przy każdym requeście (skipTotal).
+
+_AFTER_CREATED_RE = re.compile(r"^\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(\.\d+)?Z$")
+_AFTER_ID_RE = re.compile(r"^[A-Za-z0-9_]{1,64}$")
+
+def parse_after_cursor(after: str | None) -> Tuple[str, str] | None:
+    if after is None:
+        return None
+    created, sep, pid = after.rpartition(",")
+    if not sep or not _AFTER_CREATED_RE.match(created) or not _AFTER_ID_RE.match(pid):
+        raise HTTPException(status_code=404)
+    return created, pid
+
+def _list_order(list_key: str, pred: Callable[[Dict[str, Any]], bool]) -> List[Tuple[str, str]]:
+    hit = _LIST_ORDER_CACHE.get(list_key)
+    if hit is None:
+        hit = sorted(
+            ((p.get("created") or "", p["id"]) for p in _POST_CATALOG.values() if pred(p)),
+            reverse=True,
+        )
+        # klucz pochodzi z URL (/kategoria/{category}) -> pamiętamy tylko niepuste listy,
+        # czyli istniejące kategorie / serie; wymyślone nie rozdmuchują cache
+        if hit:
+            _LIST_ORDER_CACHE[list_key] = hit
+    return hit
+
+async def fetch_post_list(
+    base_filter: str,
+    list_key: str,
+    pred: Callable[[Dict[str, Any]], bool],
+    page: int,
+    per_page: int,
+    after: Tuple[str, str] | None = None,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Surowe rekordy (_POST_LIST_FIELDS) jednej strony listy + pagination.
+    pred(wpis katalogu) musi odpowiadać base_filter - z niego liczymy total i kursory.
+    """
+    order = _list_order(list_key, pred) if _POST_CATALOG_TS else None
+
+    if order is None and after is None:
+        # katalog jeszcze się nie zbudował -> zwykły offset z licznikiem z PocketBase
+        data = await pb_get(
+            f"/api/collections/{POSTS_COLLECTION}/records",
+            params={
+                "page": page,
+                "perPage": per_page,
+                "sort": "-created",
+                "filter": base_filter,
+                "fields": _POST_LIST_FIELDS,
+            },
+        )
+        items = data.get("items") or []
+        return items, {
+            "page": int(data.get("page") or page),
+            "per_page": int(data.get("perPage") or per_page),
+            "total_pages": int(data.get("totalPages") or 1),
+            "total_items": int(data.get("totalItems") or len(items)),
+        }
+
+    cursor = after
+    total: int | None = None
+    if order is not None:
+        total = len(order)
+        if after is not None:
+            # numer strony dla pagera: ile wpisów listy jest nowszych niż kursor
+            page = sum(1 for e in order if e > after) // per_page + 1
+        else:
+            start = (page - 1) * per_page
+            if start > 0 and start >= total:
+                # strona za końcem listy -> widok zwróci 404
+                return [], {
+                    "page": page,
+                    "per_page": per_page,
+                    "total_pages": max(1, ceil(total / per_page)),
+                    "total_items": total,
+                }
+            cursor = order[start - 1] if start > 0 else None
+    else:
+        page = 0  # kursor bez katalogu: pozycja nieznana
+
+    flt = base_filter
+    if cursor is not None:
+        c_created, c_id = pb_escape(cursor[0]), pb_escape(cursor[1])
+        flt = f'({base_filter}) && ((created<"{c_created}") || (created="{c_created}" && id<"{c_id}"))'
+
+    # +1 rekord mówi, czy jest następna strona (bez liczenia wszystkich)
+    data = await pb_get(
+        f"/api/collections/{POSTS_COLLECTION}/records",
+        params={
+            "page": 1,
+            "perPage": per_page + 1,
+            "sort": "-created,-id",
+            "filter": flt,
+            "fields": _POST_LIST_FIELDS,
+            "skipTotal": 1,
+        },
+    )
+    items = data.get("items") or []
 
-    for p in range(1, total + 1):
-        if p == page:
-            parts.append(f"<strong>{p}</strong>")
-        else:
-            parts.append(f'<a href="{url_for(p)}">{p}</a>')
+    if order is not None and cursor is None:
+        # pierwsza strona jest z PB na żywo, kolejne z kursorów z katalogu (do 5 min starego):
+        # nowy post przesunąłby listę i ostatni wpis starej strony 1 nie trafiłby nigdzie
+        # -> dopisujemy do katalogu posty, których jeszcze nie zna
+        unknown = [it for it in items if it.get("id") and it["id"] not in _POST_CATALOG]
+        for it in unknown:
+            post_catalog_upsert(it)
+        if unknown:
+            total = len(_list_order(list_key, pred))
 
-    if page < total:
-        parts.append(f'<a href="{url_for(page+1)}">Następna »</a>')
+    has_next = len(items) > per_page
+    items = items[:per_page]
 
-    parts.append("</div>")
-    return "".join(parts)
+    pagination: Dict[str, Any] = {
+        "page": page,
+        "per_page": per_page,
+        "total_pages": max(1, ceil(total / per_page)) if total is not None else 0,
+        "total_items": total if total is not None else len(items),
+        "next_after": f'{items[-1].get("created")},{items[-1].get("id")}' if has_next and items else None,
+    }
+    return items, pagination
 
 async def get_series_list() -> List[Dict[str, str]]:
     data = await pb_get(
@@ -842,38 +1887,40 @@ async def get_series_list() -> List[Dict[str, str]]:
     return out
 
 
-async def get_posts_by_series(series_id: str, page: int, per_page: int) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+async def get_posts_by_series(
+    series_id: str,
+    page: int,
+    per_page: int,
+    after: Tuple[str, str] | None = None,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
     sid = pb_escape(series_id)
 
-    data = await pb_get(
-        f"/api/collections/{POSTS_COLLECTION}/records",
-        params={
-            "page": page,
-            "perPage": per_page,
-            "sort": "-created",
-            "filter": f'(published=true) && (series="{sid}")',
-        },
+    items, pagination = await fetch_post_list(
+        f'(published=true) && (series="{sid}")',
+        f"series:{series_id}",
+        lambda p: p.get("series") == series_id,
+        page,
+        per_page,
+        after,
     )
-
-    items = data.get("items") or []
-    for it in items:
-        await attach_series_data(it)
+    await prepare_list_items(items)
 
     posts = [normalize_post(it) for it in items]
-
-    pagination = {
-        "page": int(data.get("page") or page),
-        "per_page": int(data.get("perPage") or per_page),
-        "total_pages": int(data.get("totalPages") or 1),
-        "total_items": int(data.get("totalItems") or len(posts)),
-    }
     return posts, pagination
 
 
 @router.get("/seria/{series_slug}", response_class=HTMLResponse)
-async def series_view(request: Request, series_slug: str, page: int = Query(1), per_page: int = Query(10, ge=1, le=50)):
+@page_cache(ttl=120)
+async def series_view(
+    request: Request,
+    series_slug: str,
+    page: int = Query(1),
+    per_page: int = Query(10, ge=1, le=50),
+    after: str | None = Query(None),
+):
     if page < 1:
         raise HTTPException(status_code=404)
+    cursor = parse_after_cursor(after)
 
     series_obj = await get_series_by_slug(series_slug)
     if not series_obj:
@@ -882,10 +1929,10 @@ async def series_view(request: Request, series_slug: str, page: int = Query(1),
     series_id = series_obj["id"]
     series_label = (series_obj.get("name") or "").strip() or series_slug
 
-    posts, pagination = await get_posts_by_series(series_id=series_id, page=page, per_page=per_page)
+    posts, pagination = await get_posts_by_series(series_id=series_id, page=page, per_page=per_page, after=cursor)
 
     total_pages = int(pagination["total_pages"])
-    if total_pages > 0 and page > total_pages:
+    if (total_pages > 0 and page > total_pages) or (cursor and not posts):
         raise HTTPException(status_code=404)
 
     pagination_html = build_pagination_html(request, pagination)
@@ -905,21 +1952,8 @@ async def series_view(request: Request, series_slug: str, page: int = Query(1),
     )
 
 async def get_categories() -> List[str]:
-    data = await pb_get(
-        f"/api/collections/{POSTS_COLLECTION}/records",
-        params={
-            "page": 1,
-            "perPage": 200,
-            "filter": "published=true",
-            "fields": "category",
-        },
-    )
-    cats: List[str] = []
-    for it in (data.get("items") or []):
-        c = it.get("category")
-        if c and c not in cats:
-            cats.append(c)
-    return sorted(cats)
+    await ensure_post_catalog()
+    return list(_CATALOG_CATEGORIES)
 
 async def get_top_posts(limit: int = 5) -> List[Dict[str, Any]]:
     data = await pb_get(
@@ -929,10 +1963,13 @@ async def get_top_posts(limit: int = 5) -> List[Dict[str, Any]]:
             "perPage": limit,
             "sort": "-views",
             "filter": "published=true",
-            "expand": "series",
+            "fields": _POST_WIDGET_FIELDS,
         },
     )
-    return [normalize_post(it) for it in (data.get("items") or [])]
+    items = data.get("items") or []
+    _mark_list_items(items)
+    await attach_series_data_many(items)
+    return [normalize_post(it) for it in items]
 
 async def get_top_commented(limit: int = 5) -> List[Dict[str, Any]]:
     counts = await get_comment_counts()
@@ -952,13 +1989,14 @@ async def get_top_commented(limit: int = 5) -> List[Dict[str, Any]]:
             "page": 1,
             "perPage": limit,
             "filter": flt,
+            "fields": _POST_WIDGET_FIELDS,
         },
     )
 
     items = data.get("items") or []
 
-    for it in items:
-        await attach_series_data(it)
+    _mark_list_items(items)
+    await attach_series_data_many(items)
 
     posts = [normalize_post(it) for it in items]
 
@@ -974,37 +2012,28 @@ async def get_top_commented(limit: int = 5) -> List[Dict[str, Any]]:
     return result
 
 async def get_post_count() -> int:
-    data = await pb_get(
-        f"/api/collections/{POSTS_COLLECTION}/records",
-        params={"page": 1, "perPage": 1, "filter": "published=true", "fields": "id"},
-    )
-    return int(data.get("totalItems") or 0)
+    await ensure_post_catalog()
+    return len(_POST_CATALOG)
 
-async def get_posts_by_category(category: str, page: int, per_page: int) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+async def get_posts_by_category(
+    category: str,
+    page: int,
+    per_page: int,
+    after: Tuple[str, str] | None = None,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
     cat = pb_escape(category)
 
-    data = await pb_get(
-        f"/api/collections/{POSTS_COLLECTION}/records",
-        params={
-            "page": page,
-            "perPage": per_page,
-            "sort": "-created",
-            "filter": f'(published=true) && (category="{cat}")',
-        },
+    items, pagination = await fetch_post_list(
+        f'(published=true) && (category="{cat}")',
+        f"category:{category}",
+        lambda p: p.get("category") == category,
+        page,
+        per_page,
+        after,
     )
-
-    items = data.get("items") or []
-    for it in items:
-        await attach_series_data(it)
+    await prepare_list_items(items)
 
     posts = [normalize_post(it) for it in items]
-
-    pagination = {
-        "page": int(data.get("page") or page),
-        "per_page": int(data.get("perPage") or per_page),
-        "total_pages": int(data.get("totalPages") or 1),
-        "total_items": int(data.get("totalItems") or len(posts)),
-    }
     return posts, pagination
 
 async def public_context(request: Request) -> Dict[str, Any]:
@@ -1012,7 +2041,7 @@ async def public_context(request: Request) -> Dict[str, Any]:
         widgets = await get_public_widgets_cached()
     except Exception as e:
         print("[WIDGETS ERROR]", repr(e))
-        widgets = {"categories": [], "series_list": [], "top_posts": [], "top_commented": [], "post_count": 0, "popular_tags": []}
+        widgets = dict(_PUBLIC_WIDGET_DEFAULTS)
 
     # series_id jest w path params dla /seria/{series_id}
     selected_series = request.path_params.get("series_id")
@@ -1027,21 +2056,25 @@ async def public_context(request: Request) -> Dict[str, Any]:
 async def render_template(request: Request, name: str, **ctx: Any) -> HTMLResponse:
     base = await public_context(request)
     merged = {**base, **ctx}
-    return templates.TemplateResponse(name, {"request": request, **merged})
+    with span("render"):
+        return templates.TemplateResponse(name, {"request": request, **merged})
 
 @router.get("/", response_class=HTMLResponse)
+@page_cache(ttl=60)
 async def index(
     request: Request,
     page: int = Query(1),
     per_page: int = Query(10, ge=1, le=50),
+    after: str | None = Query(None),
 ):
     if page < 1:
         raise HTTPException(status_code=404)
+    cursor = parse_after_cursor(after)
 
-    posts, pagination = await get_all_posts(page=page, per_page=per_page)
+    posts, pagination = await get_all_posts(page=page, per_page=per_page, after=cursor)
 
     total_pages = int(pagination["total_pages"])
-    if total_pages > 0 and page > total_pages:
+    if (total_pages > 0 and page > total_pages) or (cursor and not posts):
         raise HTTPException(status_code=404)
 
     pagination_html = build_pagination_html(request, pagination)
@@ -1058,22 +2091,27 @@ async def index(
     )
 
 @router.get("/moje-projekty", response_class=HTMLResponse)
+@page_cache(ttl=600)
 async def moje_projekty(request: Request):
     return await render_template(request, "moje-projekty.html", context_name="moje-projekty")
 
 @router.get("/o-blogu", response_class=HTMLResponse)
+@page_cache(ttl=600)
 async def o_blogu(request: Request):
     return await render_template(request, "o-blogu.html", context_name="o-blogu")
 
 @router.get("/o-mnie", response_class=HTMLResponse)
+@page_cache(ttl=600)
 async def o_mnie(request: Request):
     return await render_template(request, "o-mnie.html", context_name="o-mnie")
 
 @router.get("/warunki", response_class=HTMLResponse)
+@page_cache(ttl=600)
 async def warunki(request: Request):
     return await render_template(request, "warunki.html", context_name="warunki")
 
 @router.get("/polityka-prywatnosci", response_class=HTMLResponse)
+@page_cache(ttl=600)
 async def polityka_prywatnosci(request: Request):
     return await render_template(request, "polityka-prywatnosci.html", context_name="polityka-prywatnosci")
 
@@ -1119,72 +2157,258 @@ def normalize_comment(raw: Dict[str, Any]) -> Dict[str, Any]:
         "created_pl": format_warsaw_datetime(raw.get("created")),
     }
 
-async def get_post_by_slug(slug: str) -> Dict[str, Any]:
+# --------- POST RENDER PIPELINE (cache po wersji posta) ---------
+# GALERIA: z pola PB "gallery" + placeholder w HTML
+# W treści posta wklejasz: <section class="gallery"></section>
+
+def _gallery_items_from_post(raw_post: Dict[str, Any]) -> List[Dict[str, str]]:
+    files = raw_post.get("gallery") or []
+    rid = raw_post.get("id")
+    out: List[Dict[str, str]] = []
+    for fn in files:
+        if not fn:
+            continue
+        url = pb_file_url(f"{POSTS_COLLECTION}", rid, fn)
+        thumb = url + "?thumb=500x0"  # możesz zmienić rozmiar
+        out.append({"url": url, "thumb": thumb, "alt": fn})
+    return out
+
+def _build_post_gallery_html(items: List[Dict[str, str]]) -> str:
+    if not items:
+        return ""
+    parts = ['<div class="gallery-grid">']
+    for it in items:
+        parts.append(
+            f'<a href="{it["url"]}" class="gallery-item" data-full="{it["url"]}">'
+            f'<img src="{it["thumb"]}" alt="{it.get("alt","")}" loading="lazy" decoding="async">'
+            f"</a>"
+        )
+    parts.append("</div>")
+    return "".join(parts)
+
+def _inject_gallery_placeholder(html: str, gallery_html: str) -> str:
+    if not html or not gallery_html:
+        return html or ""
+    # Najprostszy i stabilny wariant: dokładny placeholder
+    placeholder = '<section class="gallery"></section>'
+    if placeholder in html:
+        return html.replace(placeholder, f'<section class="gallery">{gallery_html}</section>')
+    # Minimalny fallback na whitespace/newline z edytora
+    placeholder2 = '<section class="gallery"> </section>'
+    if placeholder2 in html:
+        return html.replace(placeholder2, f'<section class="gallery">{gallery_html}</section>')
+    return html
+
+POST_RENDER_CACHE_MAX_ENTRIES = 2000
+# (id posta, updated posta, updated serii) -> wynik render_post_body
+# bez TTL: klucz zmienia się razem z wersją posta, stare wersje wypycha LRU
+_POST_RENDER_CACHE = TTLCache(maxsize=POST_RENDER_CACHE_MAX_ENTRIES)
+# (id posta, updated) -> liczba słów treści; listy pobierają tylko zajawkę, więc czas
+# czytania bierzemy stąd (wypełniają go indeks wyszukiwarki, prerender i post_detail)
+_WORD_COUNT_CACHE = TTLCache(maxsize=POST_RENDER_CACHE_MAX_ENTRIES)
+
+def _post_version_key(raw: Dict[str, Any]) -> Tuple[str, str, str] | None:
+    rid = raw.get("id")
+    updated = raw.get("updated")
+    if not rid or not updated:
+        return None
+    # opis serii jest doklejany do treści -> jego zmiana też unieważnia render
+    series_obj = raw.get("_series")
+    series_updated = (series_obj.get("updated") or "") if isinstance(series_obj, dict) else ""
+    return str(rid), str(updated), str(series_updated)
+
+def _word_count_key(raw: Dict[str, Any]) -> Tuple[str, str] | None:
+    rid, updated = raw.get("id"), raw.get("updated")
+    return (str(rid), str(updated)) if rid and updated else None
+
+def _store_word_count(raw: Dict[str, Any]) -> int:
+    # liczy z raw["content"] (pełny HTML) i zapisuje, bez odczytu cache
+    words = html_word_count(raw.get("content") or "")
+    key = _word_count_key(raw)
+    if key is not None:
+        _WORD_COUNT_CACHE.set(key, words)
+    return words
+
+def _post_word_count(raw: Dict[str, Any]) -> int | None:
+    """
+    Liczba słów treści posta z cache albo z raw["content"] (pełny HTML).
+    None = rekord z listy (bez treści) i brak wpisu w cache.
+    Wynik zostaje w raw["_words"] - jeden odczyt cache na rekord, choć pytamy kilka razy.
+    """
+    if "_words" in raw:
+        return raw["_words"]
+
+    key = _word_count_key(raw)
+    words = _WORD_COUNT_CACHE.get(key) if key is not None else MISSING
+    if words is MISSING:
+        if "content" not in raw:
+            return None
+        words = _store_word_count(raw)
+
+    raw["_words"] = words
+    return words
+
+def _reading_time_for(raw: Dict[str, Any]) -> int | None:
+    words = _post_word_count(raw)
+    if words is None:
+        return None
+    # opis serii jest doklejany do treści -> liczy się do czasu czytania
+    series_obj = raw.get("_series")
+    if isinstance(series_obj, dict):
+        words += html_word_count((series_obj.get("description") or "").strip())
+    return reading_time_from_words(words)
+
+def render_post_body(raw: Dict[str, Any], content: str) -> Dict[str, Any]:
+    """
+    Pełny pipeline treści posta (galeria -> TOC + id nagłówków -> lazy images).
+    Wynik trzymamy per wersja posta, więc liczymy go raz na edycję, a nie raz na odsłonę.
+    Zwracanego słownika nie modyfikować (współdzielony).
+    """
+    key = _post_version_key(raw)
+    if key is not None:
+        hit = _POST_RENDER_CACHE.get(key)
+        if hit is not MISSING:
+            return hit
+
+    with span("postprocess"):
+        gallery_items = _gallery_items_from_post(raw)
+        html = _inject_gallery_placeholder(content, _build_post_gallery_html(gallery_items))
+
+        # TOC + id w nagłówkach
+        html, toc = build_toc_and_inject_ids(html)
+
+        rendered = {
+            "content": lazy_images(html),
+            "toc": toc,
+            "gallery_items": gallery_items,
+        }
+    if key is not None:
+        _POST_RENDER_CACHE.set(key, rendered)
+    return rendered
+
+async def prerender_published_posts() -> int:
+    """
+    Przepuszcza wszystkie opublikowane posty przez render_post_body,
+    żeby pierwsze odsłony po starcie/edycji nie płaciły za pipeline.
+    """
+    done = 0
+    page = 1
+    per_page = 50
+
+    while True:
+        data = await pb_get(
+            f"/api/collections/{POSTS_COLLECTION}/records",
+            params={
+                "page": page,
+                "perPage": per_page,
+                "sort": "-created",
+                "filter": "published=true",
+            },
+        )
+
+        items = data.get("items") or []
+        await attach_series_data_many(items)
+        for it in items:
+            post = normalize_post(it)
+            render_post_body(it, post.get("content", ""))
+            done += 1
+
+        if page >= data.get("totalPages", 1):
+            break
+        page += 1
+
+    return done
+
+# slug -> (surowy rekord posta, time.monotonic() ostatniego potwierdzenia w PB)
+# None = brak posta (krótko, żeby świeżo opublikowany post szybko się pojawił)
+_POST_SLUG_CACHE = TTLCache(maxsize=500, ttl=60 * 60, negative_ttl=10)
+# młodszy wpis oddajemy bez pytania PB; starszy rewalidujemy po (id, updated)
+POST_REVALIDATE_AFTER = 30
+
+def invalidate_post(slug: str | None = None) -> None:
+    if slug is None:
+        _POST_SLUG_CACHE.clear()
+    else:
+        _POST_SLUG_CACHE.invalidate(slug)
+
+def _post_slug_filter(slug: str) -> str:
+    return f'(published=true) && (slug="{pb_escape(slug)}")'
+
+async def _get_post_raw_by_slug(slug: str) -> Optional[Dict[str, Any]]:
+    cached = _POST_SLUG_CACHE.get(slug)
+    if cached is None:
+        return None
+
+    if cached is not MISSING:
+        raw, checked_at = cached
+        if (time.monotonic() - checked_at) < POST_REVALIDATE_AFTER:
+            return raw
+
+        # tania rewalidacja: pytamy tylko o id + updated
+        try:
+            data = await pb_get(
+                f"/api/collections/{POSTS_COLLECTION}/records",
+                params={
+                    "page": 1,
+                    "perPage": 1,
+                    "filter": _post_slug_filter(slug),
+                    "fields": "id,updated",
+                },
+            )
+        except httpx.HTTPError as e:
+            # PocketBase nie odpowiada / 5xx / bezpiecznik otwarty -> ostatnia znana wersja
+            print("[POST] revalidation failed, serving cached", slug, repr(e))
+            return raw
+        items = data.get("items") or []
+        if not items:
+            return _POST_SLUG_CACHE.set(slug, None)
+        if items[0].get("id") == raw.get("id") and items[0].get("updated") == raw.get("updated"):
+            _POST_SLUG_CACHE.set(slug, (raw, time.monotonic()))
+            return raw
+
     data = await pb_get(
         f"/api/collections/{POSTS_COLLECTION}/records",
         params={
             "page": 1,
             "perPage": 1,
-            "filter": f'(published=true) && (slug="{slug}")',
+            "filter": _post_slug_filter(slug),
         },
     )
     items = data.get("items") or []
     if not items:
-        raise HTTPException(status_code=404, detail="Post not found")
+        return _POST_SLUG_CACHE.set(slug, None)
 
     raw = items[0]
+    _POST_SLUG_CACHE.set(slug, (raw, time.monotonic()))
+    # świeży rekord -> aktualizujemy indeksy budowane w tle
+    post_catalog_upsert(raw)
+    search_index_upsert(raw)
+    return raw
+
+async def get_post_meta_by_slug(slug: str) -> Dict[str, Any]:
+    """
+    Lekka wersja get_post_by_slug dla ścieżek zapisu (np. add_comment):
+    bez powiązanych postów, TOC, galerii i liczników komentarzy.
+    """
+    raw = await _get_post_raw_by_slug(slug)
+    if raw is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+    return normalize_post(raw)
+
+async def get_post_by_slug(slug: str) -> Dict[str, Any]:
+    raw = await _get_post_raw_by_slug(slug)
+    if raw is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+
     await attach_series_data(raw)
 
     post = normalize_post(raw)
 
-    # =========================
-    # ✅ GALERIA: z pola PB "gallery" + placeholder w HTML
-    # W treści posta wklejasz: <section class="gallery"></section>
-    # =========================
-
-    def _gallery_items_from_post(raw_post: Dict[str, Any]) -> List[Dict[str, str]]:
-        files = raw_post.get("gallery") or []
-        rid = raw_post.get("id")
-        out: List[Dict[str, str]] = []
-        for fn in files:
-            if not fn:
-                continue
-            url = pb_file_url(f"{POSTS_COLLECTION}", rid, fn)
-            thumb = url + "?thumb=500x0"  # możesz zmienić rozmiar
-            out.append({"url": url, "thumb": thumb, "alt": fn})
-        return out
-
-    def _build_gallery_html(items: List[Dict[str, str]]) -> str:
-        if not items:
-            return ""
-        parts = ['<div class="gallery-grid">']
-        for it in items:
-            parts.append(
-                f'<a href="{it["url"]}" class="gallery-item" data-full="{it["url"]}">'
-                f'<img src="{it["thumb"]}" alt="{it.get("alt","")}" loading="lazy" decoding="async">'
-                f"</a>"
-            )
-        parts.append("</div>")
-        return "".join(parts)
-
-    def _inject_gallery_placeholder(html: str, gallery_html: str) -> str:
-        if not html or not gallery_html:
-            return html or ""
-        # Najprostszy i stabilny wariant: dokładny placeholder
-        placeholder = '<section class="gallery"></section>'
-        if placeholder in html:
-            return html.replace(placeholder, f'<section class="gallery">{gallery_html}</section>')
-        # Minimalny fallback na whitespace/newline z edytora
-        placeholder2 = '<section class="gallery"> </section>'
-        if placeholder2 in html:
-            return html.replace(placeholder2, f'<section class="gallery">{gallery_html}</section>')
-        return html
-
-    post["gallery_items"] = _gallery_items_from_post(raw)
-    post["content"] = _inject_gallery_placeholder(post.get("content", ""), _build_gallery_html(post["gallery_items"]))
-
-    # TOC + id w nagłówkach
-    post["content"], post["toc"] = build_toc_and_inject_ids(post.get("content", ""))
+    # galeria + TOC + lazy images + czas czytania: raz na wersję posta (cache po `updated`)
+    rendered = render_post_body(raw, post.get("content", ""))
+    post["gallery_items"] = rendered["gallery_items"]
+    post["content"] = rendered["content"]
+    post["toc"] = list(rendered["toc"])  # kopia, bo dopinamy "Komentarze"
 
     if post.get("comments_on"):
         post["toc"].append({"level": 2, "id": "comments", "title": "Komentarze"})
@@ -1199,19 +2423,14 @@ async def get_post_by_slug(slug: str) -> Dict[str, Any]:
 
     return post
 
-async def pb_post(path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
-    url = PB_URL.rstrip("/") + path
-    token = await get_service_token()
-    headers = {"Authorization": f"Bearer {token}"}
-    client = await get_http_client()
-    r = await client.post(url, json=payload, headers=headers)
-    r.raise_for_status()
+@timed("pb")
+async def pb_post(path: str, payload: Dict[str, Any], timeout: Any = None) -> Dict[str, Any]:
+    r = await pb_request_auth("POST", path, json=payload, timeout=timeout)
     return r.json()
 
+@timed("pb")
 async def pb_post_noauth(path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
-    url = PB_URL.rstrip("/") + path
-    client = await get_http_client()
-    r = await client.post(url, json=payload)
+    r = await _PB.request("POST", path, json=payload)
     r.raise_for_status()
     return r.json()
 
@@ -1237,44 +2456,137 @@ async def get_comments_for_post(post_id: str, page: int, per_page: int) -> Tuple
     }
     return comments, meta
 
-@router.get("/post/{slug}", response_class=HTMLResponse)
-async def post_detail(
-    request: Request,
-    slug: str,
-    cpage: int = Query(1, ge=1),
-):
-    post = await get_post_by_slug(slug)
+# --------- VIEWS (bufor + zapis paczkami w tle) ---------
+# 1 rekord views na (visitor, post, dzień UTC). Duplikaty odsiewamy lokalnie (_VIEW_SEEN),
+# a zapis do PocketBase robi zadanie w tle - odpowiedź nie czeka na POST.
+
+VIEW_FLUSH_INTERVAL = 5  # sekundy
+VIEW_FLUSH_BATCH = 50  # rekordów w jednym /api/batch
+VIEW_PENDING_MAX = 10_000  # gdy PB leży dłużej, najstarsze wpisy odpadają
+
+_VIEW_PENDING: List[Dict[str, str]] = []
+_VIEW_SEEN: set[Tuple[str, str, str]] = set()  # (visitor_id, post_id, dzień)
+_VIEW_SEEN_DAY: str = ""
+_VIEW_FLUSH_LOCK = asyncio.Lock()
+# /api/batch trzeba włączyć w ustawieniach PB; jeśli odmówi, przechodzimy na pojedyncze POST-y
+_VIEW_BATCH_SUPPORTED = True
+
+def record_post_view(request: Request, post_id: str, slug: str) -> None:
+    global _VIEW_SEEN_DAY
 
-# --- views: próbujemy utworzyć rekord 1/visitor/post/day (day = początek dnia UTC) ---
     visitor_id = request.cookies.get(VISITOR_COOKIE_NAME)
-    if visitor_id:
-        day_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    if not visitor_id:
+        return
+
+    day_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    day = day_start.isoformat()
+
+    # nowy dzień -> wczorajsze klucze już się nie powtórzą
+    if day != _VIEW_SEEN_DAY:
+        _VIEW_SEEN.clear()
+        _VIEW_SEEN_DAY = day
+
+    key = (visitor_id, post_id, day)
+    if key in _VIEW_SEEN:
+        return
+    _VIEW_SEEN.add(key)
+
+    _VIEW_PENDING.append({"visitor_id": visitor_id, "post": post_id, "day": day})
+    if len(_VIEW_PENDING) > VIEW_PENDING_MAX:
+        del _VIEW_PENDING[: len(_VIEW_PENDING) - VIEW_PENDING_MAX]
+
+async def _record_post_view_on_cache_hit(request: Request, meta: Dict[str, Any]) -> None:
+    if meta.get("post_id"):
+        record_post_view(request, meta["post_id"], meta.get("slug") or "")
+
+def _is_duplicate_view_error(exc: httpx.HTTPStatusError) -> bool:
+    # Przy UNIQUE INDEX (visitor_id, post, day) -> duplikat = ignorujemy
+    try:
+        body = exc.response.text or ""
+    except Exception:
+        body = ""
+
+    low = body.lower()
+    return exc.response.status_code in (400, 409) and ("unique" in low or "constraint" in low or "already exists" in low)
+
+async def _flush_views_one_by_one(chunk: List[Dict[str, str]]) -> Tuple[int, int]:
+    created = duplicates = 0
+    for rec in chunk:
+        try:
+            await pb_post("/api/collections/views/records", rec)
+            created += 1
+        except httpx.HTTPStatusError as exc:
+            if exc.response.status_code >= 500:
+                # błąd PocketBase, nie rekordu -> flush_post_views odłoży resztę do kolejki
+                # (już zapisane wrócą jako duplikaty)
+                raise
+            if _is_duplicate_view_error(exc):
+                duplicates += 1
+            else:
+                print(f"[VIEW] ERROR status={exc.response.status_code} post={rec['post']} body={exc.response.text[:200]!r}")
+    return created, duplicates
+
+async def _flush_views_chunk(chunk: List[Dict[str, str]]) -> Tuple[int, int]:
+    global _VIEW_BATCH_SUPPORTED
+
+    if _VIEW_BATCH_SUPPORTED:
         try:
             await pb_post(
-                "/api/collections/views/records",
+                "/api/batch",
                 {
-                    "visitor_id": visitor_id,
-                    "post": post["id"],
-                    "day": day_start.isoformat(),
+                    "requests": [
+                        {"method": "POST", "url": "/api/collections/views/records", "body": rec}
+                        for rec in chunk
+                    ]
                 },
+                timeout=15,  # jedna transakcja na cały chunk -> dłuższy budżet niż zwykły request
             )
-            print(f"[VIEW] created views record post={post['id']} slug={slug} visitor={visitor_id[:6]}… day={day_start.date()}")
+            return len(chunk), 0
         except httpx.HTTPStatusError as exc:
-            # Przy UNIQUE INDEX (visitor_id, post, day) -> duplikat = ignorujemy
-            status_code = exc.response.status_code
-            body = ""
+            if exc.response.status_code >= 500:
+                raise  # jak błąd połączenia: flush_post_views odkłada chunk do kolejki
+            if exc.response.status_code in (403, 404):
+                print("[VIEW] /api/batch unavailable, falling back to single inserts")
+                _VIEW_BATCH_SUPPORTED = False
+            # 400 = zwykle duplikat z innego workera; batch jest transakcją,
+            # więc poleciał cały -> ponawiamy pojedynczo
+
+    return await _flush_views_one_by_one(chunk)
+
+async def flush_post_views() -> None:
+    async with _VIEW_FLUSH_LOCK:
+        if not _VIEW_PENDING:
+            return
+
+        pending = _VIEW_PENDING[:]
+        _VIEW_PENDING.clear()
+
+        created = duplicates = 0
+        for i in range(0, len(pending), VIEW_FLUSH_BATCH):
+            chunk = pending[i:i + VIEW_FLUSH_BATCH]
             try:
-                body = exc.response.text or ""
-            except Exception:
-                body = ""
+                c, d = await _flush_views_chunk(chunk)
+            except Exception as e:
+                # PB niedostępny / 5xx -> wracają do kolejki na następną próbę
+                print("[VIEW] flush failed, requeueing", len(pending) - i, repr(e))
+                _VIEW_PENDING[:0] = pending[i:]
+                break
+            created += c
+            duplicates += d
 
-            low = body.lower()
-            is_duplicate = status_code in (400, 409) and ("unique" in low or "constraint" in low or "already exists" in low)
+        print(f"[VIEW] flushed created={created} duplicates={duplicates} pending={len(_VIEW_PENDING)}")
 
-            if is_duplicate:
-                print(f"[VIEW] duplicate (ignored) post={post['id']} slug={slug} visitor={visitor_id[:6]}… day={day_start.date()}")
-            else:
-                print(f"[VIEW] ERROR status={status_code} post={post['id']} slug={slug} body={body[:200]!r}")
+@router.get("/post/{slug}", response_class=HTMLResponse)
+@page_cache(ttl=60, on_hit=_record_post_view_on_cache_hit)
+async def post_detail(
+    request: Request,
+    slug: str,
+    cpage: int = Query(1, ge=1),
+):
+    post = await get_post_by_slug(slug)
+    request.state.page_cache_meta = {"post_id": post["id"], "slug": slug}
+
+    record_post_view(request, post["id"], slug)
 
     comments, cmeta = await get_comments_for_post(post["id"], page=cpage, per_page=10)
 
@@ -1352,7 +2664,43 @@ async def search_view(
         context_name="search",
     )
 
+async def get_posts_by_tag(tag: str, page: int, per_page: int) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    # dokładne dopasowanie (z indeksu albo z PB, gdy katalog jeszcze się nie zbudował),
+    # stronicowanie w pamięci
+    ids = (_TAG_INDEX.get(tag) or []) if _POST_CATALOG_TS else await _tag_post_ids_pb(tag)
+    start = (page - 1) * per_page
+    items = await get_posts_by_ids(ids[start:start + per_page], fields=_POST_LIST_FIELDS)
+    await prepare_list_items(items)
+
+    comment_counts = await get_comment_counts()
+
+    posts = []
+    for it in items:
+        post = normalize_post(it)
+        post["comments"] = comment_counts.get(post["id"], 0)
+        posts.append(post)
+
+    pagination = {
+        "page": page,
+        "per_page": per_page,
+        "total_pages": max(1, ceil(len(ids) / per_page)),
+        "total_items": len(ids),
+    }
+    return posts, pagination
+
+async def _tag_post_ids_pb(tag: str) -> List[str]:
+    # ~ to dopasowanie podciągu ("go" łapie też "golang") -> bierzemy same id + tagi
+    # wszystkich trafień i odsiewamy tu, żeby total i strony liczyły się z dokładnych
+    items = await _scan_records(
+        POSTS_COLLECTION,
+        f'published=true && tags ~ "{pb_escape(tag)}"',
+        "id,tags",
+        "-created",
+    )
+    return [it["id"] for it in items if it.get("id") and tag in _as_list(it.get("tags"))]
+
 @app.get("/tag/{tag}", response_class=HTMLResponse)
+@page_cache(ttl=120)
 async def tag_page(
     request: Request,
     tag: str,
@@ -1362,38 +2710,14 @@ async def tag_page(
     if page < 1:
         raise HTTPException(status_code=404)
 
-    # filtr dla multi-select tags
-    filter_str = f'published=true && tags ~ "{tag}"'
-
-    data = await pb_get(
-        f"/api/collections/{POSTS_COLLECTION}/records",
-        params={
-            "page": page,
-            "perPage": per_page,
-            "filter": filter_str,
-            "sort": "-created",
-        },
-    )
-
-    items = data.get("items") or []
-    posts = [normalize_post(it) for it in items]
+    posts, pagination = await get_posts_by_tag(tag=tag, page=page, per_page=per_page)
 
-    total_pages = int(data.get("totalPages") or 1)
+    total_pages = int(pagination["total_pages"])
     if total_pages > 0 and page > total_pages:
         raise HTTPException(status_code=404)
 
-    pagination_html = build_pagination_html(request, {
-        "page": page,
-        "per_page": per_page,
-        "total_pages": total_pages,
-        "total_items": data.get("totalItems", 0),
-    })
-    pag_ctx = build_pagination_context(request, {
-        "page": page,
-        "per_page": per_page,
-        "total_pages": total_pages,
-        "total_items": data.get("totalItems", 0),
-    })
+    pagination_html = build_pagination_html(request, pagination)
+    pag_ctx = build_pagination_context(request, pagination)
 
     return await render_template(
     request,
@@ -1401,12 +2725,7 @@ async def tag_page(
     posts=posts,
     selected_tag=tag,
     pagination_html=pagination_html,
-    pagination={
-        "page": page,
-        "per_page": per_page,
-        "total_pages": total_pages,
-        "total_items": data.get("totalItems", 0),
-    },
+    pagination=pagination,
     page_title="Tagi",
     page_heading=f'Tag: {tag}',
     **pag_ctx,
@@ -1414,19 +2733,22 @@ async def tag_page(
 
 
 @router.get("/kategoria/{category}", response_class=HTMLResponse)
+@page_cache(ttl=120)
 async def category_view(
     request: Request,
     category: str,
     page: int = Query(1),
     per_page: int = Query(10, ge=1, le=50),
+    after: str | None = Query(None),
 ):
     if page < 1:
         raise HTTPException(status_code=404)
+    cursor = parse_after_cursor(after)
 
-    posts, pagination = await get_posts_by_category(category=category, page=page, per_page=per_page)
+    posts, pagination = await get_posts_by_category(category=category, page=page, per_page=per_page, after=cursor)
 
     total_pages = int(pagination["total_pages"])
-    if total_pages > 0 and page > total_pages:
+    if (total_pages > 0 and page > total_pages) or (cursor and not posts):
         raise HTTPException(status_code=404)
 
     pagination_html = build_pagination_html(request, pagination)
@@ -1450,21 +2772,18 @@ def _clean_header(value: str) -> str:
     return (value or "").replace("\r", " ").replace("\n", " ").strip()
 
 
-async def verify_recaptcha(token: str, remoteip: str | None = None) -> bool:
-    if not token:
-        return False
-
-    payload = {"secret": RECAPTCHA_SECRET_KEY, "response": token}
-    if remoteip:
-        payload["remoteip"] = remoteip
+_RECAPTCHA = make_recaptcha_verifier(RECAPTCHA_VERIFIER, RECAPTCHA_SECRET_KEY)
 
-    async with httpx.AsyncClient(timeout=10) as client:
-        r = await client.post("https://www.google.com/recaptcha/api/siteverify", data=payload)
-        data = r.json()
-        return bool(data.get("success"))
+async def verify_recaptcha(
+    token: str,
+    remoteip: str | None = None,
+    hostname: str | None = None,
+    scope: str = "",
+) -> bool:
+    return await _RECAPTCHA.verify(token, remoteip, hostname, scope)
 
 
-def send_contact_email_sync(name: str, email: str, subject: str, message: str, vid: str | None) -> None:
+def build_contact_email(name: str, email: str, subject: str, message: str, vid: str | None) -> EmailMessage:
     msg = EmailMessage()
     msg["From"] = CONTACT_FROM
     msg["To"] = CONTACT_TO
@@ -1482,18 +2801,12 @@ def send_contact_email_sync(name: str, email: str, subject: str, message: str, v
     )
 
     msg.set_content(body)
+    return msg
 
-    with smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT) as s:
-        s.login(SMTP_USER, SMTP_PASS)
-        s.send_message(msg)
+# wysyłka w tle: formularz tylko zapisuje maila do kolejki (spool na dysku)
+_MAIL_QUEUE = MailQueue(MAIL_SPOOL_DIR, SMTPSender(SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASS))
 
 CONTACT_COOLDOWN_SECONDS = 600  # 10 minut
-# visitor_id -> last_sent_ts
-_CONTACT_LAST: Dict[str, int] = {}
-
-def _now_utc_ts() -> int:
-    return int(datetime.now(timezone.utc).timestamp())
-
 
 def _parse_int(s: str | None) -> int | None:
     try:
@@ -1544,31 +2857,30 @@ async def kontakt_submit(
 
     # VID z middleware cookie
     vid = request.cookies.get("visitor_id")
-    now = _now_utc_ts()
 
-    # prościutki cooldown per visitor
-    if vid:
-        last = _CONTACT_LAST.get(vid)
-        if last is not None and (now - last) < CONTACT_COOLDOWN_SECONDS:
-            return _prefill_redirect("cooldown")
+    # cooldown per visitor (wspólny dla workerów, patrz _RATE_LIMITER)
+    if vid and await _RATE_LIMITER.retry_after(f"contact:{vid}") > 0:
+        return _prefill_redirect("cooldown")
 
     # reCAPTCHA
     ok = await verify_recaptcha(
         recaptcha_response,
         remoteip=request.client.host if request.client else None,
+        hostname=request.url.hostname,
+        scope=f"contact:{vid or ''}",
     )
     if not ok:
         return _prefill_redirect("recaptcha")
 
-    # wysyłka maila (SMTP jest sync, więc do wątku)
+    # do kolejki; SMTP (z ponowieniami) obsługuje worker w tle
     try:
-        await asyncio.to_thread(send_contact_email_sync, name, email, subject, message, vid)
+        _MAIL_QUEUE.enqueue(build_contact_email(name, email, subject, message, vid))
     except Exception as e:
         print("[CONTACT ERROR]", repr(e))
         return _prefill_redirect("send")
 
     if vid:
-        _CONTACT_LAST[vid] = now
+        await _RATE_LIMITER.hit(f"contact:{vid}", CONTACT_COOLDOWN_SECONDS)
 
     return RedirectResponse(url="/kontakt?sent=1#kontakt", status_code=303)
 
@@ -1588,7 +2900,7 @@ async def add_comment(
     terms_accepted: str = Form(None),
     recaptcha_response: str = Form(None, alias="g-recaptcha-response"),
 ):
-    post = await get_post_by_slug(slug)
+    post = await get_post_meta_by_slug(slug)
     if not post.get("comments_on", True):
         raise HTTPException(status_code=404)
 
@@ -1622,6 +2934,8 @@ async def add_comment(
     ok = await verify_recaptcha(
         token=recaptcha_response or "",
         remoteip=request.client.host if request.client else None,
+        hostname=request.url.hostname,
+        scope=f"comment:{request.cookies.get('visitor_id') or ''}:{post['id']}",
     )
     if not ok:
         return _prefill_redirect("recaptcha")
@@ -1630,19 +2944,16 @@ async def add_comment(
     if not visitor_id:
         visitor_id = secrets.token_hex(16)
 
-    # ✅ cooldown
-    last_dt = await get_last_comment_utc_for_post(visitor_id, post["id"])
-    if last_dt:
-        now_utc = datetime.now(timezone.utc)
-        elapsed = (now_utc - last_dt).total_seconds()
-        remaining = int(COMMENT_COOLDOWN_SECONDS - elapsed)
-        if remaining > 0:
-            resp = _prefill_redirect("cooldown", {"t": str(remaining)})
-            if "visitor_id" not in request.cookies:
-                resp.set_cookie("visitor_id", visitor_id, max_age=60 * 60 * 24 * 365, samesite="lax")
-            return resp
-
-    await pb_post(
+    # ✅ cooldown (z rate limitera, bez zapytania do PocketBase)
+    cooldown_key = f"comment:{visitor_id}:{post['id']}"
+    remaining = ceil(await _RATE_LIMITER.retry_after(cooldown_key))
+    if remaining > 0:
+        resp = _prefill_redirect("cooldown", {"t": str(remaining)})
+        if "visitor_id" not in request.cookies:
+            resp.set_cookie("visitor_id", visitor_id, max_age=60 * 60 * 24 * 365, samesite="lax")
+        return resp
+
+    created = await pb_post(
         f"/api/collections/{COMMENTS_COLLECTION}/records",
         payload={
             "post": post["id"],
@@ -1654,9 +2965,11 @@ async def add_comment(
         },
     )
 
-    global _COMMENT_COUNT_CACHE
-    _COMMENT_COUNT_CACHE = None
+    _comment_index_apply(created, advance_hwm=False)
+    await _RATE_LIMITER.hit(cooldown_key, COMMENT_COOLDOWN_SECONDS)
     _cache_invalidate("public:")
+    # liczniki komentarzy i widgety są na każdej stronie -> czyścimy cały page cache
+    _page_cache_invalidate()
 
 
     resp = RedirectResponse(url=f"/post/{slug}?sent=1#comments", status_code=303)
@@ -1664,13 +2977,123 @@ async def add_comment(
         resp.set_cookie("visitor_id", visitor_id, max_age=60 * 60 * 24 * 365, samesite="lax")
     return resp
 
-# @router.get("/_debug/views")
-# async def debug_views():
-#     # Uwaga: tylko do lokalnych testów / wyłącz na produkcji
-#     return {
-#         "pending": _VIEW_PENDING,
-#         "seen_size": len(_VIEW_SEEN),
-#     }
+def _is_local_request(request: Request) -> bool:
+    # za reverse proxy klient to adres proxy, więc z zewnątrz to nigdy nie jest loopback
+    return bool(request.client) and request.client.host in ("127.0.0.1", "::1")
+
+@router.get("/_metrics", include_in_schema=False)
+async def metrics_view(request: Request):
+    # tylko lokalnie, np. curl http://127.0.0.1:8000/_metrics z hosta / kontenera
+    if not _is_local_request(request):
+        raise HTTPException(status_code=404)
+    return {
+        **METRICS.snapshot(),
+        "pocketbase": {"get": _PB_GET_COALESCER.stats(), "breaker": _PB.breaker.state},
+    }
+
+def _require_admin(request: Request, mutating: bool = False) -> None:
+    """
+    404 zamiast 403 - z zewnątrz endpointu "nie ma".
+    Loopback zależy od wdrożenia (proxy na 127.0.0.1, --proxy-headers), więc endpointy
+    zmieniające stan (mutating) działają tylko z ustawionym ADMIN_TOKEN (fail closed).
+    """
+    if not _is_local_request(request):
+        raise HTTPException(status_code=404)
+    if mutating and not ADMIN_TOKEN:
+        raise HTTPException(status_code=404)
+    if ADMIN_TOKEN and not secrets.compare_digest(request.headers.get("x-admin-token", ""), ADMIN_TOKEN):
+        raise HTTPException(status_code=404)
+
+# cache z inwalidacją po prefiksie klucza (klucze-krotki jako "a:b", np. "id_posta:")
+_ADMIN_TTL_CACHES: Dict[str, TTLCache] = {
+    "post_render": _POST_RENDER_CACHE,
+    "word_count": _WORD_COUNT_CACHE,
+    "post_slug": _POST_SLUG_CACHE,
+    "series": _SERIES_CACHE,
+    "series_slug": _SERIES_SLUG_CACHE,
+}
+
+def _admin_invalidate(name: str, prefix: str) -> int:
+    if name == "public":
+        return _cache_invalidate(prefix)
+    if name == "page":
+        return _page_cache_invalidate(prefix)
+    return _ADMIN_TTL_CACHES[name].invalidate_prefix(prefix)
+
+@router.get("/_admin/caches", include_in_schema=False)
+async def admin_caches(request: Request):
+    _require_admin(request)
+    now = time.time()
+    return {
+        "public": {
+            **_PUBLIC_CACHE_STATS.as_dict(),
+            "entries": len(_PUBLIC_CACHE),
+            "approx_bytes": approx_size(_PUBLIC_CACHE),
+        },
+        "page": {
+            **_PAGE_CACHE_STATS.as_dict(),
+            "entries": len(_PAGE_CACHE),
+            "maxsize": PAGE_CACHE_MAX_ENTRIES,
+            "approx_bytes": approx_size(_PAGE_CACHE),
+        },
+        **{name: cache.stats() for name, cache in _ADMIN_TTL_CACHES.items()},
+        "post_catalog": {
+            "entries": len(_POST_CATALOG),
+            "age_s": round(now - _POST_CATALOG_TS) if _POST_CATALOG_TS else None,
+            "approx_bytes": approx_size(_POST_CATALOG),
+        },
+        "search_index": {
+            "docs": len(_SEARCH_INDEX),
+            "age_s": round(now - _SEARCH_INDEX_REBUILD_TS) if _SEARCH_INDEX_READY else None,
+        },
+        "comment_index": {
+            "comments": len(_COMMENT_INDEX),
+            "posts": len(_COMMENT_COUNTS),
+            "approx_bytes": approx_size(_COMMENT_INDEX) + approx_size(_COMMENT_COUNTS),
+        },
+        "views": {
+            "pending": len(_VIEW_PENDING),
+            "seen": len(_VIEW_SEEN),
+            "approx_bytes": approx_size(_VIEW_PENDING) + approx_size(_VIEW_SEEN),
+        },
+        "rate_limiter": {"active": await _RATE_LIMITER.count()},
+        "mail_queue": {"pending": await asyncio.to_thread(_MAIL_QUEUE.pending_count)},
+    }
+
+@router.post("/_admin/caches/invalidate", include_in_schema=False)
+async def admin_caches_invalidate(
+    request: Request,
+    prefix: str = Query(...),
+    cache: str | None = Query(None),
+):
+    # np. curl -X POST -H 'X-Admin-Token: ...' 'http://127.0.0.1:8000/_admin/caches/invalidate?cache=page&prefix=example.com/post/'
+    # bez `cache` -> we wszystkich; prefix="" czyści całość
+    _require_admin(request, mutating=True)
+    names = ["public", "page", *_ADMIN_TTL_CACHES]
+    if cache is not None:
+        if cache not in names:
+            raise HTTPException(status_code=400, detail=f"unknown cache: {cache}")
+        names = [cache]
+
+    removed = {name: _admin_invalidate(name, prefix) for name in names}
+    print(f"[ADMIN] invalidated prefix={prefix!r}", removed)
+    return {"removed": removed}
+
+@router.post("/_admin/series/invalidate", include_in_schema=False)
+async def admin_series_invalidate(request: Request, id: str | None = Query(None)):
+    # po zmianie serii w panelu PB; bez `id` -> wszystkie serie
+    _require_admin(request, mutating=True)
+    invalidate_series(id or None)
+    print(f"[ADMIN] invalidated series {id or '*'}")
+    return {"series": id or "*"}
+
+@router.post("/_admin/posts/invalidate", include_in_schema=False)
+async def admin_post_invalidate(request: Request, slug: str | None = Query(None)):
+    # np. po zmianie sluga w panelu PB (stary slug zostałby w cache do TTL); bez `slug` -> wszystkie
+    _require_admin(request, mutating=True)
+    invalidate_post(slug or None)
+    print(f"[ADMIN] invalidated post {slug or '*'}")
+    return {"post": slug or "*"}
 
 
 app.include_router(router)
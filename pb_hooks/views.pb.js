@@ -1,18 +1,56 @@
 /// <reference path="../pb_data/types.d.ts" />
 
-onRecordAfterCreateSuccess(async (e) => {
+onRecordAfterCreateSuccess((e) => {
   // e.record to nowo utworzony rekord w kolekcji "views"
+  const views = require(`${__hooks}/views_utils.js`);
+
   const postId = e.record.get("post");
-  if (!postId) return;
+  if (!postId) {
+    e.next();
+    return;
+  }
 
   const app = e.app || $app;
 
-  // Atomowy update w DB (bez read-modify-write, bez wyścigów)
-  await app
-    .db()
-    .newQuery("UPDATE posts SET views = views + 1 WHERE id = {:id}")
-    .bind({ id: postId })
-    .execute();
+  if (views.mode() !== "batched") {
+    views.increment(app, postId, 1);
+    console.log(`[VIEW] posts.views +1 for post=${postId}`);
+    e.next();
+    return;
+  }
+
+  const pending = views.enqueue(app, postId);
+  if (pending >= views.flushThreshold()) {
+    const res = views.flush(app);
+    console.log(`[VIEW] threshold flush: ${res.views} views for ${res.posts} posts`);
+  }
+
+  e.next();
+}, "views");
+
+// tryb batched: zrzut zebranych przyrostów co minutę (najkrótszy interwał crona PB)
+cronAdd("views_flush", "* * * * *", () => {
+  const views = require(`${__hooks}/views_utils.js`);
+  if (views.mode() !== "batched") return;
+
+  const res = views.flush($app);
+  if (res.views > 0) {
+    console.log(`[VIEW] cron flush: ${res.views} views for ${res.posts} posts`);
+  }
+});
+
+// odbudowa liczników z tabeli views: POST /api/views/rebuild[?post=<id>] (tylko superuser)
+routerAdd(
+  "POST",
+  "/api/views/rebuild",
+  (e) => {
+    const views = require(`${__hooks}/views_utils.js`);
+    const postId = e.request.url.query().get("post") || "";
+
+    views.rebuild(e.app || $app, postId);
+    console.log(`[VIEW] rebuilt posts.views from views table${postId ? ` for post=${postId}` : ""}`);
 
-  console.log(`[VIEW] posts.views +1 for post=${postId}`);
-}, "views");
\ No newline at end of file
+    return e.json(200, { ok: true, post: postId || null });
+  },
+  $apis.requireSuperuserAuth()
+);
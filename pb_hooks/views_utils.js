@@ -0,0 +1,134 @@
+// Wspólne funkcje dla views.pb.js.
+// Handlery PB nie widzą nic spoza swojego scope'u, więc ładują ten plik przez require().
+//
+// VIEWS_HOOK_MODE:
+//   immediate (domyślnie) - UPDATE posts ... views + 1 przy każdym rekordzie views
+//   batched               - liczniki per post w $app.store(), zrzucane jako views + N
+//                           przez cron (co minutę) albo po przekroczeniu progu
+
+const PENDING_PREFIX = "views:pending:";
+const PENDING_TOTAL_KEY = "views:pending_total";
+
+function mode() {
+  return ($os.getenv("VIEWS_HOOK_MODE") || "immediate").trim().toLowerCase();
+}
+
+function flushThreshold() {
+  const n = parseInt($os.getenv("VIEWS_FLUSH_THRESHOLD") || "", 10);
+  return n > 0 ? n : 200;
+}
+
+function increment(app, postId, n) {
+  // Atomowy update w DB (bez read-modify-write, bez wyścigów)
+  app
+    .db()
+    .newQuery("UPDATE posts SET views = views + {:n} WHERE id = {:id}")
+    .bind({ id: postId, n: n })
+    .execute();
+}
+
+// zwraca łączną liczbę oczekujących wyświetleń (do progu flush)
+function enqueue(app, postId) {
+  const store = app.store();
+  store.setFunc(PENDING_PREFIX + postId, (old) => (old || 0) + 1);
+
+  let total = 0;
+  store.setFunc(PENDING_TOTAL_KEY, (old) => {
+    total = (old || 0) + 1;
+    return total;
+  });
+  return total;
+}
+
+function flush(app) {
+  const store = app.store();
+  const all = store.getAll();
+
+  // zabieramy liczniki (setFunc jest atomowe), dopiero potem piszemy do DB
+  const taken = {};
+  let views = 0;
+  for (const key in all) {
+    if (!key.startsWith(PENDING_PREFIX)) continue;
+
+    let n = 0;
+    store.setFunc(key, (old) => {
+      n = old || 0;
+      return 0;
+    });
+    if (n > 0) {
+      taken[key.slice(PENDING_PREFIX.length)] = n;
+      views += n;
+    }
+  }
+
+  if (views === 0) {
+    return { posts: 0, views: 0 };
+  }
+
+  store.setFunc(PENDING_TOTAL_KEY, (old) => Math.max(0, (old || 0) - views));
+
+  let posts = 0;
+  try {
+    // jedna transakcja = jedno przejęcie writera SQLite na całą paczkę
+    app.runInTransaction((txApp) => {
+      for (const postId in taken) {
+        increment(txApp, postId, taken[postId]);
+        posts++;
+      }
+    });
+  } catch (err) {
+    // nie gubimy wyświetleń - wracają do kolejki na następny flush
+    for (const postId in taken) {
+      const n = taken[postId];
+      store.setFunc(PENDING_PREFIX + postId, (old) => (old || 0) + n);
+    }
+    store.setFunc(PENDING_TOTAL_KEY, (old) => (old || 0) + views);
+    throw err;
+  }
+
+  return { posts: posts, views: views };
+}
+
+// Odbudowa posts.views z tabeli views (np. po awarii w trybie batched).
+// Uwaga: liczy tylko rekordy, które jeszcze są w views.
+function rebuild(app, postId) {
+  const store = app.store();
+
+  // oczekujące przyrosty są już w tabeli views -> po odbudowie byłyby liczone podwójnie
+  // (zerujemy atomowo jak flush, żeby wiedzieć, ile odjąć od sumy)
+  const all = store.getAll();
+  let removed = 0;
+  for (const key in all) {
+    if (!key.startsWith(PENDING_PREFIX)) continue;
+    if (postId && key !== PENDING_PREFIX + postId) continue;
+    store.setFunc(key, (old) => {
+      removed += old || 0;
+      return 0;
+    });
+  }
+  if (!postId) {
+    store.remove(PENDING_TOTAL_KEY);
+  } else if (removed > 0) {
+    // inaczej różnica zostaje w sumie na zawsze i po dojściu do progu każdy widok robi flush
+    store.setFunc(PENDING_TOTAL_KEY, (old) => Math.max(0, (old || 0) - removed));
+  }
+
+  const sql =
+    "UPDATE posts SET views = (SELECT COUNT(*) FROM views WHERE views.post = posts.id)" +
+    (postId ? " WHERE id = {:id}" : "");
+
+  const q = app.db().newQuery(sql);
+  if (postId) {
+    q.bind({ id: postId });
+  }
+  q.execute();
+}
+
+module.exports = {
+  mode,
+  flushThreshold,
+  increment,
+  enqueue,
+  flush,
+  rebuild,
+};